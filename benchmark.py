@@ -0,0 +1,317 @@
+import argparse
+import json
+import os
+import platform
+import random
+import resource
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+CORPORA = ['python', 'prose', 'minified', 'log']
+DEFAULT_SIZES = ['1K', '1M', '10M']
+# Metrics compared against the baseline; lower is better for all of them
+LOWER_IS_BETTER = ['open_s', 'highlight_s', 'find_s', 'replace_all_s', 'save_s',
+                   'status_ms', 'keystroke_p50_ms', 'keystroke_p95_ms', 'keystroke_p99_ms',
+                   'peak_rss_mb']
+# Differences below these are noise whatever the ratio
+NOISE_FLOOR = {'_s': 0.005, '_ms': 0.5, '_mb': 5}
+
+WORDS = ("the of and to in is was for on that with as by at from editor buffer line "
+         "text file search replace window thread token cache index widget").split()
+
+
+# Synthetic corpora
+def parse_size(size):
+    """Turn sizes such as 512, 1K, 10M or 1G into a byte count"""
+    units = {'K': 1 << 10, 'M': 1 << 20, 'G': 1 << 30}
+    size = size.strip().upper()
+    if size[-1] in units:
+        return int(float(size[:-1]) * units[size[-1]])
+    return int(size)
+
+
+def python_block(rng, n):
+    """Return a chunk of plausible Python source"""
+    name = f"{rng.choice(WORDS)}_{n}"
+    return (f"def {name}(value, count=10):\n"
+            f"    \"\"\"Return the {rng.choice(WORDS)} of value\"\"\"\n"
+            f"    # {' '.join(rng.choices(WORDS, k=6))}\n"
+            f"    result = [str(item) for item in range(count) if item % {rng.randint(2, 9)}]\n"
+            f"    if value is None:\n"
+            f"        return '{rng.choice(WORDS)}'\n"
+            f"    return len(result) + {rng.random():.3f}\n\n\n")
+
+
+def prose_block(rng, n):
+    """Return a paragraph of prose"""
+    sentences = (' '.join(rng.choices(WORDS, k=rng.randint(6, 16))).capitalize() + '.'
+                 for _ in range(rng.randint(3, 7)))
+    return ' '.join(sentences) + '\n\n'
+
+
+def minified_block(rng, n):
+    """Return a piece of a single very long minified line"""
+    return ''.join(f"function {rng.choice(WORDS)}{n}_{i}(a,b){{return a+b*{i}}};" for i in range(20))
+
+
+def log_block(rng, n):
+    """Return one log line"""
+    level = rng.choice(['INFO', 'INFO', 'INFO', 'WARN', 'ERROR', 'DEBUG'])
+    return (f"2024-01-01T00:{n // 60 % 60:02d}:{n % 60:02d}.{n % 1000:03d} {level} "
+            f"[{rng.choice(WORDS)}] {' '.join(rng.choices(WORDS, k=8))} id={n}\n")
+
+
+BLOCKS = {'python': python_block, 'prose': prose_block, 'minified': minified_block, 'log': log_block}
+
+
+def write_corpus(path, corpus, size, seed=0):
+    """Write a deterministic corpus of about size bytes to path"""
+    rng = random.Random(seed)
+    block = BLOCKS[corpus]
+    written = n = 0
+    with open(path, 'w', encoding='utf-8', newline='\n') as f:
+        while written < size:
+            chunk = block(rng, n)
+            f.write(chunk)
+            written += len(chunk)
+            n += 1
+        if corpus == 'minified':
+            f.write('\n')
+
+
+# Running one case inside a fresh process
+def pump(root, done, timeout=600):
+    """Process Tk events until done() is true; return the elapsed seconds"""
+    started = time.perf_counter()
+    while not done():
+        root.update()
+        if time.perf_counter() - started > timeout:
+            raise TimeoutError("benchmark step did not finish")
+        time.sleep(0.001)
+    return time.perf_counter() - started
+
+
+def highlight_idle(editor):
+    """Return True once no highlighting work is queued or running"""
+    return not (editor.highlight_busy or editor.pending_spans or editor.highlight_job)
+
+
+def percentile(samples, p):
+    """Return the p-th percentile of a list of samples"""
+    if len(samples) < 2:
+        return samples[0] if samples else 0.0
+    return statistics.quantiles(samples, n=100, method='inclusive')[p - 1]
+
+
+def run_case(corpus, size, keystrokes):
+    """Measure one corpus and size in this process; return the results"""
+    import tkinter as tk
+    sys.path.insert(0, HERE)
+    from texteditor import TextEditor
+
+    workdir = tempfile.mkdtemp(prefix='pyedit-bench-')
+    try:
+        path = os.path.join(workdir, f"{corpus}.{'py' if corpus == 'python' else 'txt'}")
+        write_corpus(path, corpus, size)
+        # The editor keeps its session and journal in the working directory
+        os.chdir(workdir)
+        root = tk.Tk()
+        editor = TextEditor(root)
+        root.update()
+        result = {}
+
+        started = time.perf_counter()
+        editor.open_path(path)
+        if editor.large_file:
+            index = editor.large_file
+            pump(root, lambda: index.complete)
+            result['open_s'] = time.perf_counter() - started
+            result['large_file'] = True
+        else:
+            pump(root, lambda: editor.file_loader is None)
+            result['open_s'] = time.perf_counter() - started
+            result['highlight_s'] = pump(root, lambda: highlight_idle(editor))
+            measure_editing(root, editor, result, keystrokes)
+
+        result['peak_rss_mb'] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+        root.destroy()
+        return result
+    finally:
+        os.chdir(HERE)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+def measure_editing(root, editor, result, keystrokes):
+    """Time find, replace, status, keystrokes and save on a loaded buffer"""
+    text = editor.text
+
+    editor.show_find_panel()
+    editor.find_entry.insert(0, 'return')
+    started = time.perf_counter()
+    editor.find_text()
+    pump(root, lambda: editor.search_job is None or editor.search_job.done)
+    result['find_s'] = time.perf_counter() - started
+
+    calls = 50
+    started = time.perf_counter()
+    for _ in range(calls):
+        editor.update_status()
+    result['status_ms'] = (time.perf_counter() - started) / calls * 1000
+
+    # Keystrokes go through the widget's own bindings, then idle work runs
+    text.focus_force()
+    text.mark_set('insert', '1.0 lineend')
+    root.update()
+    latencies = []
+    for i in range(keystrokes):
+        keysym = 'space' if i % 6 == 5 else 'x'
+        started = time.perf_counter()
+        text.event_generate('<KeyPress>', keysym=keysym, when='now')
+        root.update_idletasks()
+        latencies.append((time.perf_counter() - started) * 1000)
+    for p in (50, 95, 99):
+        result[f'keystroke_p{p}_ms'] = percentile(latencies, p)
+    pump(root, lambda: highlight_idle(editor))
+
+    editor.find_entry.delete(0, 'end')
+    editor.find_entry.insert(0, 'the')
+    editor.replace_entry.insert(0, 'THE')
+    started = time.perf_counter()
+    editor.replace_all()
+    result['replace_all_s'] = time.perf_counter() - started
+
+    started = time.perf_counter()
+    editor.save_file()
+    pump(root, lambda: editor.save_thread is None)
+    result['save_s'] = time.perf_counter() - started
+
+
+# Orchestration
+def start_virtual_display():
+    """Start Xvfb on a free display if none is set; return the process"""
+    if os.environ.get('DISPLAY'):
+        return None
+    if not shutil.which('Xvfb'):
+        sys.exit("benchmark: no DISPLAY and Xvfb is not installed")
+    for number in range(99, 199):
+        if not os.path.exists(f"/tmp/.X11-unix/X{number}"):
+            break
+    process = subprocess.Popen(['Xvfb', f':{number}', '-screen', '0', '1280x1024x24', '-nolisten', 'tcp'],
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    os.environ['DISPLAY'] = f':{number}'
+    deadline = time.time() + 10
+    while not os.path.exists(f"/tmp/.X11-unix/X{number}"):
+        if time.time() > deadline or process.poll() is not None:
+            sys.exit("benchmark: Xvfb did not start")
+        time.sleep(0.05)
+    return process
+
+
+def run_all(args):
+    """Run every case in its own process so peak RSS is per case"""
+    cases = {}
+    for corpus in args.corpora:
+        for size in args.sizes:
+            name = f"{corpus}-{size}"
+            print(f"running {name}...", file=sys.stderr)
+            proc = subprocess.run(
+                [sys.executable, os.path.abspath(__file__), '--run-case', corpus, size,
+                 '--keystrokes', str(args.keystrokes)],
+                capture_output=True, text=True)
+            if proc.returncode:
+                print(proc.stderr, file=sys.stderr)
+                cases[name] = {'error': proc.stderr.strip().splitlines()[-1:]}
+            else:
+                cases[name] = json.loads(proc.stdout)
+    return {
+        'meta': {
+            'timestamp': datetime.now().isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'keystrokes': args.keystrokes,
+        },
+        'cases': cases,
+    }
+
+
+def compare(results, baseline, threshold):
+    """Print each metric against the baseline; return the regressions"""
+    regressions = []
+    for name, case in results['cases'].items():
+        base = baseline.get('cases', {}).get(name)
+        if not base:
+            continue
+        if 'error' in case and 'error' not in base:
+            # A case that used to run and now crashes is the worst regression
+            print(f"{name:20} {'error':18} {' '.join(case['error'])}  REGRESSION")
+            regressions.append((name, 'error', None, None))
+            continue
+        for metric in LOWER_IS_BETTER:
+            if metric not in case or metric not in base:
+                continue
+            new, old = case[metric], base[metric]
+            floor = next(v for suffix, v in NOISE_FLOOR.items() if metric.endswith(suffix))
+            ratio = new / old if old else float('inf')
+            flag = ''
+            if new - old > floor and ratio > 1 + threshold:
+                flag = '  REGRESSION'
+                regressions.append((name, metric, old, new))
+            print(f"{name:20} {metric:18} {old:12.4f} {new:12.4f} {ratio:7.2f}x{flag}")
+    return regressions
+
+
+def main(argv=None):
+    """Run the benchmarks, write JSON and compare against a baseline"""
+    parser = argparse.ArgumentParser(description="Benchmark PyEdit on synthetic corpora")
+    parser.add_argument('--corpora', default=','.join(CORPORA),
+                        help="comma-separated corpora (default: %(default)s)")
+    parser.add_argument('--sizes', default=','.join(DEFAULT_SIZES),
+                        help="comma-separated sizes such as 1K,1M,200M (default: %(default)s)")
+    parser.add_argument('--keystrokes', type=int, default=200, help="keystrokes to time per case")
+    parser.add_argument('--output', default='benchmark_results.json', help="where to write results")
+    parser.add_argument('--baseline', help="results file to compare against")
+    parser.add_argument('--threshold', type=float, default=0.2,
+                        help="slowdown ratio above which a metric regresses (default: 0.2 = 20%%)")
+    parser.add_argument('--run-case', nargs=2, metavar=('CORPUS', 'SIZE'), help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.run_case:
+        corpus, size = args.run_case
+        json.dump(run_case(corpus, parse_size(size), args.keystrokes), sys.stdout)
+        return 0
+
+    args.corpora = [c for c in args.corpora.split(',') if c]
+    args.sizes = [s for s in args.sizes.split(',') if s]
+    unknown = set(args.corpora) - set(CORPORA)
+    if unknown:
+        parser.error(f"unknown corpora: {', '.join(sorted(unknown))}")
+
+    xvfb = start_virtual_display()
+    try:
+        results = run_all(args)
+    finally:
+        if xvfb:
+            xvfb.terminate()
+
+    with open(args.output, 'w') as f:
+        json.dump(results, f, indent=2)
+    print(f"results written to {args.output}", file=sys.stderr)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.threshold)
+        if regressions:
+            print(f"{len(regressions)} regressions over {args.threshold:.0%}", file=sys.stderr)
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,24 @@
+import os
+import sys
+import tkinter as tk
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from texteditor import TextEditor  # noqa: E402
+
+
+@pytest.fixture
+def editor(tmp_path, monkeypatch):
+    """A TextEditor in a withdrawn window; skipped without a display"""
+    monkeypatch.chdir(tmp_path)
+    try:
+        root = tk.Tk()
+    except tk.TclError:
+        pytest.skip("no display")
+    root.withdraw()
+    editor = TextEditor(root)
+    root.update()
+    yield editor
+    root.destroy()
@@ -0,0 +1,37 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from texteditor import main, replace_in_file  # noqa: E402
+
+
+def test_replace_keeps_crlf_line_endings(tmp_path):
+    path = tmp_path / "crlf.txt"
+    path.write_bytes(b"foo bar\r\nbaz foo\r\n")
+    result = replace_in_file(str(path), ('foo', False, False, False), 'qux')
+    assert result == (str(path), 2, [], None)
+    assert path.read_bytes() == b"qux bar\r\nbaz qux\r\n"
+
+
+def test_regex_does_not_match_line_endings(tmp_path):
+    path = tmp_path / "mixed.txt"
+    path.write_bytes(b"a foo\r\nfoo\nlast foo")
+    replace_in_file(str(path), (r'foo\s*$', True, False, False), 'x')
+    assert path.read_bytes() == b"a x\r\nx\nlast x"
+
+
+def test_dry_run_reports_lines_without_endings(tmp_path):
+    path = tmp_path / "dry.txt"
+    path.write_bytes(b"one\r\ntwo foo\r\n")
+    result = replace_in_file(str(path), ('foo', False, False, False), 'bar', dry_run=True)
+    assert result == (str(path), 1, [(2, 'two foo', 'two bar')], None)
+    assert path.read_bytes() == b"one\r\ntwo foo\r\n"
+
+
+def test_each_file_is_replaced_once(tmp_path, capsys):
+    path = tmp_path / "d.txt"
+    path.write_text("a\n")
+    assert main(['--replace', 'a', 'aa', str(path), str(tmp_path / "." / "d.txt"), str(tmp_path)]) == 0
+    assert path.read_text() == "aa\n"
+    assert "replaced 1 occurrences in 1 files" in capsys.readouterr().err
@@ -0,0 +1,20 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from texteditor import Document, WIDE_COLUMNS, write_atomically  # noqa: E402
+
+
+def test_edit_after_emoji_saves_where_tk_put_it(tmp_path):
+    document = Document('\U0001F600\nabc')
+    # Tk's index for the end of the emoji's line
+    col = 1 + (WIDE_COLUMNS - 1)
+    document.insert(document.index_offset(1, col), 'y')
+    document.delete(document.index_offset(2, 1), 1)
+    assert document.text() == '\U0001F600y\nac'
+    assert document.index(2) == f"1.{col + 1}"
+
+    path = tmp_path / "emoji.txt"
+    write_atomically(str(path), document.snapshot().chunks())
+    assert path.read_text(encoding='utf-8') == '\U0001F600y\nac'
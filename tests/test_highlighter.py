@@ -0,0 +1,68 @@
+import os
+import random
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from texteditor import Document, PythonLexer, SyntaxHighlighter  # noqa: E402
+
+KEYWORDS = ['def', 'class', 'return', 'if', 'else']
+BUILTINS = ['print', 'len']
+PIECES = ['def ', 'x', ' = ', '"', "'", '"""', "'''", '\\', '#', '\n', 'print(', ')', '12',
+          'len', ' if ', 'else', 'r"', '\n\n']
+
+
+def full_lex(lexer, text):
+    """Tokenize text from the top, returning the spans of every line"""
+    spans, state = [], None
+    for line in text.split('\n'):
+        line_spans, state = lexer.tokenize_line(line, state)
+        spans.append(line_spans)
+    return spans
+
+
+def test_lexer_carries_strings_across_lines():
+    lexer = PythonLexer(KEYWORDS, BUILTINS)
+    spans, state = lexer.tokenize_line('x = """doc # not a comment', None)
+    assert spans == [(4, 26, 'string')] and state == '"""'
+    spans, state = lexer.tokenize_line('end""" # done', state)
+    assert spans == [(0, 6, 'string'), (7, 13, 'comment')] and state is None
+    assert lexer.tokenize_line('def f(): return len(0x1f)', None)[0] == [
+        (0, 3, 'keyword'), (9, 15, 'keyword'), (16, 19, 'builtin'), (20, 24, 'number')]
+
+
+def test_incremental_passes_match_a_full_relex():
+    lexer = PythonLexer(KEYWORDS, BUILTINS)
+    rng = random.Random(1234)
+    document = Document(''.join(rng.choice(PIECES) for _ in range(300)))
+    highlighter = SyntaxHighlighter(lexer)
+    highlighter.reset(document.line_count())
+    # What the widget shows: the spans last applied to each line, None once edited
+    shown = [None] * document.line_count()
+
+    for step in range(300):
+        offset = rng.randrange(len(document) + 1)
+        line = document.position(offset)[0]
+        if rng.random() < 0.6 or not len(document):
+            chars = ''.join(rng.choice(PIECES) for _ in range(rng.randint(1, 4)))
+            document.insert(offset, chars)
+            highlighter.lines_inserted(line, chars.count('\n'))
+            shown[line - 1:line] = [None] * (chars.count('\n') + 1)
+        else:
+            chars = document.get(offset, offset + rng.randint(1, 20))
+            document.delete(offset, len(chars))
+            highlighter.lines_deleted(line, chars.count('\n'))
+            shown[line - 1:line + chars.count('\n')] = [None]
+
+        # Alternate viewport passes with full ones, as scrolling would
+        if step % 3:
+            first = rng.randint(1, document.line_count())
+            last = min(first + rng.randint(0, 10), document.line_count())
+        else:
+            first, last = 1, document.line_count()
+        for number, spans in highlighter.rehighlight(document.get_lines, first, last):
+            shown[number - 1] = spans
+        expected = full_lex(lexer, document.text())
+        assert len(shown) == len(expected) == len(highlighter.line_states)
+        for number in range(first, last + 1):
+            assert shown[number - 1] == expected[number - 1], (step, number)
@@ -0,0 +1,45 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from texteditor import EditJournal  # noqa: E402
+
+
+def test_journal_round_trip(tmp_path):
+    path = str(tmp_path / "edits.journal")
+    journal = EditJournal(path)
+    journal.reset(EditJournal.header(None), [['i', '1.0', 'ab\n']])
+    journal.append(['d', '1.0', 2])
+    journal.append(['i', '2.0', '\U0001F600'])
+    journal.close()
+    assert EditJournal.read(path) == ({'file': None},
+                                      [['i', '1.0', 'ab\n'], ['d', '1.0', 2], ['i', '2.0', '\U0001F600']])
+
+
+def test_torn_last_line_is_ignored(tmp_path):
+    path = tmp_path / "torn.journal"
+    path.write_text('{"file": null}\n["i","1.0","x"]\n["d","1.', encoding='utf-8')
+    assert EditJournal.read(str(path)) == ({'file': None}, [['i', '1.0', 'x']])
+
+
+def test_replayed_emoji_delete_removes_the_whole_character(editor, monkeypatch):
+    editor.new_file()
+    deltas = []
+    monkeypatch.setattr(editor.journal, 'append', deltas.append)
+    editor.text.insert('1.0', 'x\U0001F600y\nc')
+    editor.text.delete('1.1', '1.0 lineend')
+    expected = editor.document.text()
+
+    editor.new_file()
+    editor.replay_journal(deltas)
+    assert editor.document.text() == expected == 'x\nc'
+
+
+def test_write_failures_are_reported(tmp_path):
+    errors = []
+    journal = EditJournal(str(tmp_path / "missing" / "edits.journal"),
+                          lambda what, error: errors.append(what))
+    journal.reset(EditJournal.header(None))
+    journal.close()
+    assert errors == ["writing the crash-recovery journal"]
@@ -0,0 +1,45 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from texteditor import LogTail  # noqa: E402
+
+
+def make_tail(tmp_path, data=b"first\n"):
+    path = tmp_path / "app.log"
+    path.write_bytes(data)
+    return path, LogTail(str(path), len(data), encoding='utf-8')
+
+
+def test_appends_are_read_in_order(tmp_path):
+    path, tail = make_tail(tmp_path)
+    assert tail.check() is None
+    with open(path, 'ab') as f:
+        f.write("second é\r\n".encode('utf-8'))
+    assert tail.check() == ('append', "second é\n", path.stat().st_size)
+    assert tail.matches(path.stat().st_size)
+
+
+def test_truncation_rotation_and_rewrites_are_reported(tmp_path):
+    path, tail = make_tail(tmp_path)
+    path.write_bytes(b"fir\n")
+    assert tail.check()[0] == 'truncated'
+
+    path, tail = make_tail(tmp_path)
+    path.write_bytes(b"FIRST\nmore\n")
+    assert tail.check()[0] == 'changed'
+    assert not tail.matches(6)
+
+    path, tail = make_tail(tmp_path)
+    replacement = tmp_path / "new.log"
+    replacement.write_bytes(b"first\n")
+    os.replace(replacement, path)
+    assert tail.check()[0] == 'rotated'
+
+
+def test_missing_file_is_reported_once(tmp_path):
+    path, tail = make_tail(tmp_path)
+    os.remove(path)
+    assert tail.check() == ('missing', None, 6)
+    assert tail.check() is None
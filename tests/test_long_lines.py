@@ -0,0 +1,17 @@
+import tkinter as tk
+
+
+def test_long_line_mode_survives_freeze_and_thaw(editor):
+    editor.new_file()
+    frozen = editor.buffer
+    editor.text.insert('1.0', 'x' * 100)
+    editor.set_long_lines(True)
+    editor.new_file()
+    editor.destroy_text_widget(frozen)
+    frozen.freeze()
+
+    editor.activate_buffer(frozen)
+    assert editor.long_lines
+    assert str(editor.text.cget('wrap')) == tk.NONE
+    assert editor.text.hbar is not None and editor.text.hbar.winfo_manager() == 'pack'
+    assert editor.long_lines_var.get()
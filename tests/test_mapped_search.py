@@ -0,0 +1,31 @@
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from texteditor import LineIndex, MappedSearch, compile_search  # noqa: E402
+
+
+def run(search):
+    search.start()
+    deadline = time.monotonic() + 10
+    while not search.done and time.monotonic() < deadline:
+        time.sleep(0.01)
+    return search.span
+
+
+def test_scans_across_blocks_and_wraps(tmp_path, monkeypatch):
+    monkeypatch.setattr(MappedSearch, 'BLOCK_BYTES', 64)
+    path = tmp_path / "big.txt"
+    path.write_bytes(b"needle\n" + b"x" * 200 + b"\nhay needle\n")
+    index = LineIndex(str(path)).start()
+    try:
+        query = ('needle', False, False, False)
+        pattern = compile_search(*query, encoding=index.encoding)
+        assert run(MappedSearch(index, query, pattern, 1)) == (212, 218)
+        assert run(MappedSearch(index, query, pattern, 218)) == (0, 6)
+        missing = ('pin', False, False, False)
+        assert run(MappedSearch(index, missing, compile_search(*missing, encoding='ascii'), 0)) is None
+    finally:
+        index.close()
@@ -0,0 +1,34 @@
+import os
+import re
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from texteditor import compile_search, replace_regions, substitute  # noqa: E402
+
+
+def apply(text, regions):
+    for start, end, new in reversed(regions):
+        text = text[:start] + new + text[end:]
+    return text
+
+
+def test_regions_match_one_pass_substitution():
+    text = ('foo bar ' * 50 + '\n' + 'x' * 10000 + '\n') * 5 + 'foo'
+    for regex, replace in ((False, 'qux'), (True, r'<\g<0>>')):
+        pattern = compile_search('fo+' if regex else 'foo', regex)
+        regions, count = replace_regions(pattern, replace, text, regex, gap=100, limit=3)
+        assert len(regions) == 3
+        assert (apply(text, regions), count) == substitute(pattern, replace, text, regex)
+
+
+def test_untouched_text_stays_outside_regions():
+    text = 'a' + 'x' * 5000 + 'a'
+    regions, count = replace_regions(re.compile('a'), 'b', text)
+    assert count == 2
+    assert regions == [(0, 1, 'b'), (5001, 5002, 'b')]
+
+
+def test_unchanged_regions_are_skipped():
+    regions, count = replace_regions(re.compile('a'), 'a', 'banana')
+    assert regions == [] and count == 3
@@ -0,0 +1,53 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from texteditor import PythonLexer, SymbolIndex  # noqa: E402
+
+SOURCE = '''import os
+
+x = (
+1)
+s = """
+def fake(): pass
+"""
+
+class A:
+    def m(self):
+        pass
+
+@decorator
+async def g():
+    pass
+'''
+
+
+def make_index():
+    return SymbolIndex(PythonLexer(['def', 'class', 'pass', 'async'], ['print']))
+
+
+def test_symbols_of_each_top_level_block():
+    assert make_index().update(SOURCE) == [
+        (3, 0, 'variable', 'x', 0),
+        (5, 0, 'variable', 's', 0),
+        (9, 0, 'class', 'A', 0),
+        (10, 4, 'def', 'A.m', 1),
+        (14, 0, 'def', 'g', 0),
+    ]
+
+
+def test_unfinished_definition_does_not_hide_later_ones():
+    source = SOURCE.replace('class A:', 'def broken(:\n\nclass A:')
+    names = [symbol[3] for symbol in make_index().update(source)]
+    assert names == ['x', 's', 'A', 'A.m', 'g']
+
+
+def test_only_changed_blocks_are_reparsed():
+    index = make_index()
+    index.update(SOURCE)
+    cached = dict(index.cache)
+    symbols = index.update(SOURCE.replace('async def g', 'async def h'))
+    assert symbols[-1][3] == 'h'
+    assert {key: value for key, value in index.cache.items() if key in cached} == \
+        {key: value for key, value in cached.items() if 'async def g' not in key}
@@ -0,0 +1,25 @@
+import os
+import sys
+import zlib
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from texteditor import PythonLexer, TokenCache  # noqa: E402
+
+
+def test_truncated_cache_file_is_a_miss(tmp_path):
+    source = tmp_path / "mod.py"
+    source.write_text("def f():\n    return 'x'  # done\n" * 50)
+    lines = source.read_text().split('\n')
+    lexer = PythonLexer(['def', 'return'], ['len'])
+    cache = TokenCache(str(tmp_path), 'rules')
+    content_hash, blocks = TokenCache.fingerprint(lines)
+    cache.store(str(source), os.stat(source), content_hash, blocks, TokenCache.build(lexer, lines))
+    assert cache.load(str(source)) is not None
+
+    cache_file = cache.file_for(str(source))
+    with open(cache_file, 'rb') as f:
+        data = zlib.decompress(f.read())
+    with open(cache_file, 'wb') as f:
+        f.write(zlib.compress(data[:-10]))
+    assert cache.load(str(source)) is None
@@ -0,0 +1,91 @@
+import os
+import random
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from texteditor import BufferMetrics, Document, UndoHistory  # noqa: E402
+
+
+def apply(document, edits, undo=False):
+    """Apply a record's edits, or reverse them for undo"""
+    if undo:
+        edits = [('delete' if kind == 'insert' else 'insert', offset, chars)
+                 for kind, offset, chars in reversed(edits)]
+    for kind, offset, chars in edits:
+        if kind == 'insert':
+            document.insert(offset, chars)
+        else:
+            document.delete(offset, len(chars))
+
+
+def random_edit(rng, document):
+    offset = rng.randrange(len(document) + 1)
+    if rng.random() < 0.6 or not len(document):
+        return 'insert', offset, ''.join(rng.choice('ab \n') for _ in range(rng.randint(1, 80)))
+    return 'delete', offset, document.get(offset, offset + rng.randint(1, 40))
+
+
+def test_round_trip_under_a_tiny_budget():
+    rng = random.Random(99)
+    document = Document('start\n')
+    history = UndoHistory(budget=40000)
+    texts = [document.text()]
+    for _ in range(200):
+        history.seal()
+        history.begin()
+        for _ in range(rng.randint(1, 5)):
+            kind, offset, chars = random_edit(rng, document)
+            apply(document, [(kind, offset, chars)])
+            history.record(kind, offset, chars)
+        history.end()
+        texts.append(document.text())
+    assert history.memory_usage() <= 40000
+    assert any(record['packed'] is not None for record in history.undo_stack)
+
+    undone = 0
+    while True:
+        edits = history.undo()
+        if edits is None:
+            break
+        apply(document, edits, undo=True)
+        undone += 1
+        assert document.text() == texts[-1 - undone]
+    assert 16 < undone < 200  # older records were dropped, the newest kept
+
+    while True:
+        edits = history.redo()
+        if edits is None:
+            break
+        apply(document, edits)
+    assert document.text() == texts[-1]
+
+
+def test_typing_coalesces_until_a_word_ends():
+    history = UndoHistory()
+    for offset, char in enumerate('ab cd'):
+        history.record('insert', offset, char)
+    assert history.undo() == [['insert', 2, ' cd']]
+    assert history.undo() == [['insert', 0, 'ab']]
+    assert history.undo() is None
+
+
+def test_new_edit_clears_redo():
+    history = UndoHistory()
+    history.record('insert', 0, 'x\n')
+    history.undo()
+    history.record('insert', 0, 'y\n')
+    assert history.redo() is None
+
+
+def test_metrics_follow_edit_deltas():
+    rng = random.Random(7)
+    document = Document('one two\nthree')
+    metrics = BufferMetrics(document)
+    for _ in range(300):
+        kind, offset, chars = random_edit(rng, document)
+        apply(document, [(kind, offset, chars)])
+        metrics.edited(kind, offset, chars)
+        assert metrics.words == len(document.text().split())
+    assert metrics.lines() == document.text().count('\n') + 1
+    assert metrics.chars() == len(document.text())
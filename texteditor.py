@@ -1,11 +1,2147 @@
+import time
+STARTED = time.perf_counter()  # reference point for --startup-profile
+
 import tkinter as tk
-from tkinter import filedialog, messagebox, font, scrolledtext
+from tkinter import scrolledtext
 import os
+import sys
 import json
 from datetime import datetime
+from array import array
+from collections import deque
+import argparse
+import bisect
+import codecs
+import copy
+import fnmatch
+import functools
+import hashlib
+import importlib
+import io
+import itertools
+import locale
+import mmap
+import queue
 import re
+import stat
+import tempfile
+import threading
+import zlib
+
+# Read once, while only one thread runs; os.umask cannot be queried safely later
+UMASK = os.umask(0o022)
+os.umask(UMASK)
+
+
+class LazyModule:
+    """Stand-in for a module that is only imported when first used"""
+
+    def __init__(self, name):
+        self.module_name = name
+
+    def __getattr__(self, attr):
+        return getattr(importlib.import_module(self.module_name), attr)
+
+
+# Dialogs, process pools and profiling are not needed to show the window
+filedialog = LazyModule('tkinter.filedialog')
+messagebox = LazyModule('tkinter.messagebox')
+simpledialog = LazyModule('tkinter.simpledialog')
+futures = LazyModule('concurrent.futures')
+multiprocessing = LazyModule('multiprocessing')
+cProfile = LazyModule('cProfile')
+pstats = LazyModule('pstats')
+ast = LazyModule('ast')
+
+
+class Instrumentation:
+    """Rolling handler latencies and Tcl command counts, while enabled.
+
+    Handlers wrapped with timed() cost one attribute test when disabled.
+    """
+
+    WINDOW = 1000  # latest samples kept per handler
+
+    def __init__(self):
+        self.enabled = False
+        self.reset()
+
+    def reset(self):
+        """Forget everything recorded so far"""
+        self.samples = {}
+        self.calls = {}
+        self.tcl_calls = {}
+
+    def record(self, name, ms):
+        """Add one latency sample in milliseconds"""
+        samples = self.samples.get(name)
+        if samples is None:
+            samples = self.samples[name] = deque(maxlen=self.WINDOW)
+        samples.append(ms)
+        self.calls[name] = self.calls.get(name, 0) + 1
+
+    def count_tcl(self, command):
+        """Count one Tcl round trip"""
+        self.tcl_calls[command] = self.tcl_calls.get(command, 0) + 1
+
+    def summary(self):
+        """Return call counts and p50/p95/p99/max latencies per handler"""
+        handlers = {}
+        for name, samples in self.samples.items():
+            ordered = sorted(samples)
+            last = len(ordered) - 1
+            handlers[name] = {
+                'calls': self.calls[name],
+                'p50': ordered[last * 50 // 100],
+                'p95': ordered[last * 95 // 100],
+                'p99': ordered[last * 99 // 100],
+                'max': ordered[last],
+            }
+        return {'handlers': handlers, 'tcl_calls': dict(self.tcl_calls)}
+
+    def export(self, path):
+        """Write the summary to a JSON file"""
+        data = self.summary()
+        data['timestamp'] = datetime.now().isoformat(timespec='seconds')
+        with open(path, 'w') as f:
+            json.dump(data, f, indent=2)
+
+
+PERF = Instrumentation()
+
+
+def timed(func):
+    """Record a handler's latency in PERF while it is enabled"""
+    name = func.__name__
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        if not PERF.enabled:
+            return func(*args, **kwargs)
+        started = time.perf_counter()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            PERF.record(name, (time.perf_counter() - started) * 1000)
+    return wrapper
+
+
+def write_atomically(path, chunks, encoding=None, newline=None):
+    """Write text chunks to a temporary file, fsync it and rename it over path
+
+    Returns the number of bytes written. The target is either left as it
+    was or replaced in full, never truncated. newline is passed to open().
+    """
+    path = os.path.realpath(path)
+    directory = os.path.dirname(path)
+    fd, temp_path = tempfile.mkstemp(
+        dir=directory, prefix=f".{os.path.basename(path)}.", suffix=".tmp")
+    try:
+        with os.fdopen(fd, 'w', encoding=encoding, newline=newline) as file:
+            for chunk in chunks:
+                file.write(chunk)
+            file.flush()
+            os.fsync(file.fileno())
+            size = os.fstat(file.fileno()).st_size
+        try:
+            mode = stat.S_IMODE(os.stat(path).st_mode)
+        except FileNotFoundError:
+            mode = 0o666 & ~UMASK
+        os.chmod(temp_path, mode)
+        os.replace(temp_path, path)
+    except BaseException:
+        try:
+            os.unlink(temp_path)
+        except OSError:
+            pass
+        raise
+
+    # Make the rename itself durable where directories can be fsynced
+    if hasattr(os, 'O_DIRECTORY'):
+        dir_fd = os.open(directory, os.O_RDONLY | os.O_DIRECTORY)
+        try:
+            os.fsync(dir_fd)
+        finally:
+            os.close(dir_fd)
+    return size
+
+
+def compile_search(search, regex=False, case_sensitive=False, whole_word=False, encoding=None):
+    """Compile find options into a regular expression (raises re.error)
+
+    With an encoding the pattern is compiled for searching bytes in it.
+    """
+    pattern = search if regex else re.escape(search)
+    if whole_word:
+        pattern = rf'\b(?:{pattern})\b'
+    flags = re.MULTILINE | (0 if case_sensitive else re.IGNORECASE)
+    if encoding:
+        return re.compile(pattern.encode(encoding), flags)
+    return re.compile(pattern, flags)
+
+
+def replace_template(replace, regex=False):
+    """Return a re.sub template; group references only expand in regex mode"""
+    return replace if regex else replace.replace('\\', '\\\\')
+
+
+def substitute(pattern, replace, text, regex=False):
+    """Replace every match of pattern in text in one pass
+
+    Returns the new text and the number of replacements made.
+    """
+    return pattern.subn(replace_template(replace, regex), text)
+
+
+IGNORED_NAMES = ['.git', '.hg', '.svn', '__pycache__', 'node_modules', '.tox',
+                 '.venv', '.mypy_cache', '*.pyc', '*.o', '*.so']
+
+
+def ignore_patterns(root):
+    """Return name and path globs to skip, including root/.gitignore's"""
+    patterns = list(IGNORED_NAMES)
+    try:
+        with open(os.path.join(root, '.gitignore'), encoding='utf-8', errors='replace') as f:
+            for line in f:
+                line = line.strip()
+                # Negations are not supported; skipping them errs on searching more
+                if line and not line.startswith(('#', '!')):
+                    patterns.append(line.strip('/'))
+    except OSError:
+        pass
+    return patterns
+
+
+def is_ignored(relpath, patterns):
+    """Return True if a path relative to the search root matches a pattern"""
+    name = os.path.basename(relpath)
+    return any(fnmatch.fnmatch(name, p) or fnmatch.fnmatch(relpath, p) for p in patterns)
+
+
+def walk_files(root, patterns):
+    """Yield the files under root that are not ignored, in directory order"""
+    for dirpath, dirnames, filenames in os.walk(root):
+        reldir = os.path.relpath(dirpath, root)
+        reldir = '' if reldir == '.' else reldir.replace(os.sep, '/') + '/'
+        dirnames[:] = sorted(d for d in dirnames if not is_ignored(reldir + d, patterns))
+        for name in sorted(filenames):
+            if not is_ignored(reldir + name, patterns):
+                yield os.path.join(dirpath, name)
+
+
+def search_files(paths, query, max_hits=1000):
+    """Search a batch of files for a find query (runs in a worker process)
+
+    query is the (search, regex, case_sensitive, whole_word) tuple. Returns
+    (path, line, column, preview) hits; binary files are skipped and at most
+    max_hits are reported per file.
+    """
+    pattern = compile_search(*query)
+    encoding = locale.getpreferredencoding(False)
+    hits = []
+    for path in paths:
+        try:
+            with open(path, 'rb') as f:
+                data = f.read()
+        except OSError:
+            continue
+        if b'\0' in data[:8192]:
+            continue
+        
+        text = data.decode(encoding, errors='replace')
+        line, line_start, found = 1, 0, 0
+        for match in pattern.finditer(text):
+            if match.end() == match.start():
+                continue
+            line += text.count('\n', line_start, match.start())
+            line_start = text.rfind('\n', 0, match.start()) + 1
+            line_end = text.find('\n', match.start())
+            preview = text[line_start:line_end if line_end >= 0 else len(text)]
+            hits.append((path, line, match.start() - line_start, preview.strip()[:200]))
+            found += 1
+            if found >= max_hits:
+                break
+    return hits
+
+
+def replace_in_file(path, query, replace, dry_run=False):
+    """Replace every match of a find query in one file, line by line
+
+    Runs in a worker process. Files are read as a stream of lines, so
+    patterns do not match across line breaks; a file with matches is
+    rewritten with write_atomically unless dry_run is set. Returns
+    (path, count, changes, error) where changes lists (line, old, new)
+    for a dry run.
+    """
+    regex = query[1]
+    pattern = compile_search(*query)
+    encoding = locale.getpreferredencoding(False)
+    count, changes = 0, []
+    try:
+        with open(path, 'rb') as f:
+            if b'\0' in f.read(8192):
+                return path, 0, changes, None
+        
+        # Line endings are read and written untranslated and kept out of
+        # the matching, so only the matched text changes
+        # First pass only has to find one match unless the changes are wanted
+        with open(path, encoding=encoding, newline='') as f:
+            for number, line in enumerate(f, 1):
+                line = line.rstrip('\r\n')
+                if not dry_run and pattern.search(line):
+                    count = 1
+                    break
+                new, n = substitute(pattern, replace, line, regex)
+                if n:
+                    count += n
+                    changes.append((number, line, new))
+        if not count or dry_run:
+            return path, count, changes, None
+        
+        count = 0
+        
+        def lines():
+            nonlocal count
+            with open(path, encoding=encoding, newline='') as f:
+                for line in f:
+                    text = line.rstrip('\r\n')
+                    new, n = substitute(pattern, replace, text, regex)
+                    count += n
+                    yield new + line[len(text):]
+        
+        write_atomically(path, lines(), encoding, newline='')
+        return path, count, changes, None
+    except (OSError, UnicodeDecodeError, re.error, IndexError) as e:
+        return path, 0, [], str(e)
+
+
+def run_batch_replace(args):
+    """Run --replace over files and directories without a GUI"""
+    query = (args.replace[0], args.regex, args.case_sensitive, args.whole_word)
+    try:
+        pattern = compile_search(*query)
+        pattern.sub(replace_template(args.replace[1], args.regex), '')
+    except (re.error, IndexError) as e:
+        print(f"texteditor: invalid pattern or replacement: {e}", file=sys.stderr)
+        return 2
+
+    def files():
+        # Each file once, however it was spelled or reached
+        seen = set()
+        for root in args.paths:
+            paths = walk_files(root, ignore_patterns(root)) if os.path.isdir(root) else [root]
+            for path in paths:
+                real = os.path.realpath(path)
+                if real not in seen:
+                    seen.add(real)
+                    yield path
+
+    started = time.perf_counter()
+    total = changed = errors = 0
+    with futures.ProcessPoolExecutor(args.jobs) as pool:
+        results = pool.map(replace_in_file, files(), itertools.repeat(query),
+                           itertools.repeat(args.replace[1]), itertools.repeat(args.dry_run),
+                           chunksize=16)
+        for path, count, changes, error in results:
+            if error:
+                errors += 1
+                print(f"{path}: error: {error}", file=sys.stderr)
+            elif count:
+                total += count
+                changed += 1
+                print(f"{path}: {count} replacements")
+                for number, old, new in changes:
+                    print(f"  {number}: - {old}")
+                    print(f"  {number}: + {new}")
+
+    verb = "would replace" if args.dry_run else "replaced"
+    print(f"{verb} {total} occurrences in {changed} files "
+          f"in {time.perf_counter() - started:.2f}s", file=sys.stderr)
+    return 1 if errors else 0
+
+
+def longest_line(text, carry=0):
+    """Return the length of the longest line in text and of its last line
+
+    carry is the length of an earlier line that text continues.
+    """
+    first = text.find('\n')
+    if first < 0:
+        return carry + len(text), carry + len(text)
+    last = text.rfind('\n')
+    longest = carry + first
+    if last > first:
+        longest = max(longest, max(map(len, text[first + 1:last].split('\n'))))
+    tail = len(text) - last - 1
+    return max(longest, tail), tail
+
+
+# Tcl before 9.0 stores characters outside the BMP as surrogate pairs, so
+# each one takes two columns in a Text widget index
+WIDE_CHAR = re.compile('[\U00010000-\U0010ffff]')
+WIDE_COLUMNS = 2 if tk.TclVersion < 9.0 else 1
+
+
+def tk_length(chars):
+    """Return how many Tk index columns a string takes"""
+    if WIDE_COLUMNS == 1 or chars.isascii():
+        return len(chars)
+    return len(chars) + (WIDE_COLUMNS - 1) * len(WIDE_CHAR.findall(chars))
+
+
+def tk_column(line, col):
+    """Convert a column counted in characters of line into a Tk index column"""
+    return tk_length(line[:col]) if col else 0
+
+
+def text_column(line, col):
+    """Convert a Tk index column into a column counted in characters of line"""
+    if WIDE_COLUMNS == 1 or line.isascii():
+        return col
+    wide = 0
+    for match in WIDE_CHAR.finditer(line, 0, col):
+        if match.start() + wide >= col:
+            break
+        wide += WIDE_COLUMNS - 1
+    return col - wide
+
+
+def tk_spans(line, spans):
+    """Convert (start, end, tag) spans over line into Tk index columns"""
+    if WIDE_COLUMNS == 1 or line.isascii() or not WIDE_CHAR.search(line):
+        return spans
+    return [(tk_column(line, start), tk_column(line, end), tag) for start, end, tag in spans]
+
+
+def fuzzy_score(query, candidate):
+    """Score candidate against query as a subsequence, or return None
+
+    Consecutive characters and characters that start a word (after '_' or
+    '.', or a capital) score higher; shorter candidates win ties.
+    """
+    lower = candidate.lower()
+    score = 0
+    pos = 0
+    previous = -2
+    for char in query.lower():
+        found = lower.find(char, pos)
+        if found < 0:
+            return None
+        score += 1
+        if found == previous + 1:
+            score += 4
+        if found == 0 or candidate[found - 1] in '_.' or candidate[found].isupper():
+            score += 2
+        previous = found
+        pos = found + 1
+    return score * 1000 - len(candidate)
+
+
+def replace_regions(pattern, replace, text, regex=False, gap=4096, limit=256):
+    """Replace every match of pattern in text, grouped into changed regions
+
+    Matches fewer than gap characters apart share a region, and if that
+    leaves more than limit regions the ones closest together are joined.
+    Returns (start, end, new_text) regions in order, skipping any whose
+    text is unchanged, and the number of replacements made.
+    """
+    template = replace_template(replace, regex)
+    # Without group references every match is replaced by the same text
+    literal = replace if not regex or '\\' not in replace else None
+    regions = []
+    parts = None
+    count = start = end = 0
+    for match in pattern.finditer(text):
+        count += 1
+        if parts is not None and match.start() - end >= gap:
+            regions.append((start, end, parts))
+            parts = None
+        if parts is None:
+            start, parts = match.start(), []
+        else:
+            parts.append(text[end:match.start()])
+        parts.append(literal if literal is not None else match.expand(template))
+        end = match.end()
+    if parts is not None:
+        regions.append((start, end, parts))
+    
+    if len(regions) > limit:
+        # Keep only the widest gaps between regions untouched
+        widest = sorted(range(1, len(regions)), key=lambda i: regions[i][0] - regions[i - 1][1])
+        keep = set(widest[len(regions) - limit:])
+        joined = [regions[0]]
+        for i in range(1, len(regions)):
+            if i in keep:
+                joined.append(regions[i])
+            else:
+                first, last, parts = joined[-1]
+                parts.append(text[last:regions[i][0]])
+                parts.extend(regions[i][2])
+                joined[-1] = (first, regions[i][1], parts)
+        regions = joined
+    
+    changed = []
+    for start, end, parts in regions:
+        new = ''.join(parts)
+        if new != text[start:end]:
+            changed.append((start, end, new))
+    return changed, count
+
+
+class Document:
+    """Piece table holding the editor's text independently of Tk.
+
+    The text is a list of pieces, each a (text, start, end) slice of an
+    immutable string: a loaded chunk or an inserted run. Edits split and
+    splice pieces rather than copying text, so a snapshot is a copy of the
+    piece list. Running character and newline totals per piece turn
+    offset and line/column conversions into a bisect plus a lookup within
+    one piece.
+    """
+
+    MAX_PIECES = 4096  # pieces before the text is joined into one again
+    MAX_MERGE = 4096  # typed runs grow one piece up to this length
+    SCAN_LIMIT = 4096  # slices shorter than this are scanned, not indexed
+
+    def __init__(self, text=''):
+        self.set_text(text)
+
+    def set_text(self, text):
+        """Replace the whole document"""
+        self.pieces = [(text, 0, len(text))] if text else []
+        self.lengths = [len(text)] if text else []
+        self.newlines = [text.count('\n')] if text else []
+        self.length = len(text)
+        self.line_total = text.count('\n')
+        self.breaks = {}
+        self.last_insert = None
+        self.cached_text = text
+        self.char_ends = self.line_ends = None
+
+    def snapshot(self):
+        """Return an independent copy that later edits do not affect"""
+        copy = object.__new__(Document)
+        copy.__dict__.update(self.__dict__)
+        copy.pieces = self.pieces[:]
+        copy.lengths = self.lengths[:]
+        copy.newlines = self.newlines[:]
+        copy.breaks = dict(self.breaks)
+        copy.last_insert = None
+        return copy
+
+    def __len__(self):
+        return self.length
+
+    def line_count(self):
+        """Return the number of lines"""
+        return self.line_total + 1
+
+    def text(self):
+        """Return the whole document as one string"""
+        if self.cached_text is None:
+            self.cached_text = ''.join(self.chunks())
+        return self.cached_text
+
+    def chunks(self):
+        """Yield the document's text a piece at a time"""
+        for text, start, end in self.pieces:
+            yield text if start == 0 and end == len(text) else text[start:end]
+
+    def get(self, start, end):
+        """Return the text between two offsets"""
+        start, end = max(start, 0), min(end, self.length)
+        if start >= end:
+            return ''
+        if self.cached_text is not None:
+            return self.cached_text[start:end]
+        i, within = self.locate(start)
+        parts = []
+        remaining = end - start
+        while remaining > 0:
+            text, first, last = self.pieces[i]
+            part = text[first + within:min(last, first + within + remaining)]
+            parts.append(part)
+            remaining -= len(part)
+            i, within = i + 1, 0
+        return ''.join(parts)
+
+    def get_lines(self, first, last):
+        """Return an inclusive range of lines (1-based) as a list"""
+        end = self.line_start(last + 1) - 1 if last < self.line_count() else self.length
+        return self.get(self.line_start(first), end).split('\n')
+
+    # Offset and line/column conversion
+    def totals(self):
+        """Return the running character and newline totals per piece"""
+        if self.char_ends is None:
+            self.char_ends = list(itertools.accumulate(self.lengths))
+            self.line_ends = list(itertools.accumulate(self.newlines))
+        return self.char_ends, self.line_ends
+
+    def locate(self, offset):
+        """Return the piece holding offset and the offset within it"""
+        char_ends, _ = self.totals()
+        i = bisect.bisect_right(char_ends, offset)
+        if i == len(self.pieces) and i:
+            # The end of the document belongs to the last piece
+            i -= 1
+        return i, offset - (char_ends[i - 1] if i else 0)
+
+    def line_start(self, line):
+        """Return the offset where a line (1-based) starts"""
+        if line <= 1:
+            return 0
+        if line > self.line_count():
+            return self.length
+        char_ends, line_ends = self.totals()
+        before = line - 1
+        i = bisect.bisect_left(line_ends, before)
+        text, start, end = self.pieces[i]
+        nth = before - (line_ends[i - 1] if i else 0)
+        pos = self.find_newline(text, start, nth)
+        return (char_ends[i - 1] if i else 0) + pos - start + 1
+
+    def offset(self, line, col):
+        """Convert a line (1-based) and column into an offset"""
+        return min(self.line_start(line) + col, self.length)
+
+    def position(self, offset):
+        """Convert an offset into a line (1-based) and column"""
+        if not self.pieces:
+            return 1, 0
+        offset = min(max(offset, 0), self.length)
+        i, within = self.locate(offset)
+        _, line_ends = self.totals()
+        text, start, end = self.pieces[i]
+        line = (line_ends[i - 1] if i else 0) + self.count_newlines(text, start, start + within) + 1
+        return line, offset - self.line_start(line)
+
+    def index_offset(self, line, col):
+        """Convert a line (1-based) and Tk index column into an offset"""
+        start = self.line_start(line)
+        return min(start + text_column(self.get(start, start + col), col), self.length)
+
+    def index(self, offset):
+        """Convert an offset into a Tk index"""
+        offset = min(max(offset, 0), self.length)
+        line, col = self.position(offset)
+        return f"{line}.{tk_column(self.get(offset - col, offset), col)}"
+
+    def newline_offsets(self, text):
+        """Return the offsets of every newline in a string, indexed once"""
+        entry = self.breaks.get(id(text))
+        if entry is None or entry[0] is not text:
+            entry = (text, array('q', (m.start() for m in re.finditer('\n', text))))
+            self.breaks[id(text)] = entry
+        return entry[1]
+
+    def count_newlines(self, text, start, end):
+        """Count the newlines in text[start:end]"""
+        if end - start < self.SCAN_LIMIT:
+            return text.count('\n', start, end)
+        breaks = self.newline_offsets(text)
+        return bisect.bisect_left(breaks, end) - bisect.bisect_left(breaks, start)
+
+    def find_newline(self, text, start, nth):
+        """Return the position of the nth newline in text from start"""
+        if len(text) < self.SCAN_LIMIT:
+            pos = start - 1
+            for _ in range(nth):
+                pos = text.index('\n', pos + 1)
+            return pos
+        breaks = self.newline_offsets(text)
+        return breaks[bisect.bisect_left(breaks, start) + nth - 1]
+
+    # Editing
+    def insert(self, offset, chars):
+        """Insert text at an offset"""
+        if not chars:
+            return
+        offset = min(max(offset, 0), self.length)
+        i, within = 0, 0
+        if self.pieces:
+            i, within = self.locate(offset)
+            if within == self.lengths[i]:
+                i, within = i + 1, 0
+        
+        # Typing extends the run it is appending to instead of adding pieces
+        prev = self.pieces[i - 1] if within == 0 and i else None
+        if (prev and prev[0] is self.last_insert and prev[2] == len(prev[0])
+                and prev[2] - prev[1] + len(chars) <= self.MAX_MERGE):
+            text = prev[0] + chars
+            self.pieces[i - 1] = (text, prev[1], len(text))
+            self.lengths[i - 1] += len(chars)
+            self.newlines[i - 1] += chars.count('\n')
+            self.last_insert = text
+        else:
+            new = [(chars, 0, len(chars))]
+            if within:
+                text, start, end = self.pieces[i]
+                new = [(text, start, start + within)] + new + [(text, start + within, end)]
+            self.splice(i, i + 1 if within else i, new)
+            self.last_insert = chars
+        
+        self.length += len(chars)
+        self.line_total += chars.count('\n')
+        self.edited()
+
+    def delete(self, offset, count):
+        """Delete count characters starting at an offset"""
+        offset = max(offset, 0)
+        count = min(count, self.length - offset)
+        if count <= 0:
+            return
+        i, within = self.locate(offset)
+        j, within_end = self.locate(offset + count)
+        removed = sum(self.newlines[i:j + 1])
+        
+        new = []
+        text, start, end = self.pieces[i]
+        if within:
+            new.append((text, start, start + within))
+        text, start, end = self.pieces[j]
+        if start + within_end < end:
+            new.append((text, start + within_end, end))
+        self.splice(i, j + 1, new)
+        
+        self.length -= count
+        self.line_total -= removed - sum(self.newlines[i:i + len(new)])
+        self.last_insert = None
+        self.edited()
+
+    def splice(self, i, j, pieces):
+        """Replace pieces[i:j] with new pieces"""
+        self.pieces[i:j] = pieces
+        self.lengths[i:j] = [end - start for _, start, end in pieces]
+        self.newlines[i:j] = [self.count_newlines(text, start, end) for text, start, end in pieces]
+
+    def edited(self):
+        """Drop cached totals after an edit, compacting a fragmented table"""
+        self.cached_text = None
+        self.char_ends = self.line_ends = None
+        if len(self.pieces) > self.MAX_PIECES:
+            self.set_text(self.text())
+
+
+class BufferMetrics:
+    """Word count of a Document kept current from edit deltas.
+
+    Whether an edit joins or splits words depends only on the characters
+    either side of it, so each update costs the size of the edit rather
+    than the size of the document. Lines and characters come straight from
+    the document's own totals.
+    """
+
+    def __init__(self, document):
+        self.document = document
+        self.words = len(document.text().split())
+
+    def edited(self, kind, offset, chars):
+        """Account for an insert or delete that the document already holds"""
+        doc = self.document
+        after = offset + len(chars) if kind == 'insert' else offset
+        left, right = doc.get(offset - 1, offset), doc.get(after, after + 1)
+        apart = len((left + right).split())
+        spliced = len((left + chars + right).split())
+        self.words += spliced - apart if kind == 'insert' else apart - spliced
+
+    def lines(self):
+        """Return the number of lines"""
+        return self.document.line_count()
+
+    def chars(self):
+        """Return the number of characters"""
+        return len(self.document)
+
+
+class UndoHistory:
+    """Undo and redo stacks with coalesced typing and a memory budget.
+
+    A record is a list of [kind, offset, chars] edits in document offsets.
+    Single characters typed or deleted in a row join the open record until a
+    word boundary, a pause or a jump elsewhere; begin() and end() fold a bulk
+    operation into one record. Past the budget the oldest records are
+    zlib-compressed, and dropped once compression is not enough.
+    """
+
+    COALESCE_SECONDS = 1.0
+    COMPRESS_MIN = 512  # bytes; smaller records are not worth compressing
+    KEEP_PLAIN = 16  # newest records kept uncompressed
+    EDIT_OVERHEAD = 120  # approximate bytes per edit besides its text
+
+    def __init__(self, budget=32 << 20):
+        self.budget = budget
+        self.applying = False
+        self.clear()
+
+    def clear(self):
+        """Forget all history"""
+        self.undo_stack = deque()
+        self.redo_stack = []
+        self.memory = 0
+        self.packed = 0  # leading undo records already compressed or too small
+        self.open = False
+        self.depth = 0
+        self.last_time = 0
+
+    def memory_usage(self):
+        """Return the approximate bytes held by the undo and redo stacks"""
+        return self.memory
+
+    def begin(self):
+        """Start a group of edits that undo as one record"""
+        if not self.depth:
+            self.open = False
+        self.depth += 1
+
+    def end(self):
+        """Close the group started by begin()"""
+        self.depth -= 1
+        if not self.depth:
+            self.open = False
+
+    def seal(self):
+        """Start a new record with the next edit"""
+        if not self.depth:
+            self.open = False
+
+    def record(self, kind, offset, chars):
+        """Add an edit, joining the open record where it continues it"""
+        now = time.monotonic()
+        if self.redo_stack:
+            self.memory -= sum(record['size'] for record in self.redo_stack)
+            self.redo_stack = []
+        
+        record = self.undo_stack[-1] if self.open and self.undo_stack else None
+        if record and (self.depth or (now - self.last_time < self.COALESCE_SECONDS
+                                      and self.continues(record['edits'][-1], kind, offset, chars))):
+            self.merge(record['edits'], kind, offset, chars)
+            self.resize(record)
+        else:
+            record = {'edits': [[kind, offset, chars]], 'packed': None, 'size': 0}
+            self.resize(record)
+            self.undo_stack.append(record)
+            self.open = True
+        self.last_time = now
+        if self.memory > self.budget:
+            self.enforce_budget()
+
+    def continues(self, last, kind, offset, chars):
+        """Return True if a typed character or deletion extends the last edit"""
+        if len(chars) != 1 or chars == '\n' or last[0] != kind:
+            return False
+        if kind == 'insert':
+            word_ends = chars.isspace() and not last[2][-1].isspace()
+            return offset == last[1] + len(last[2]) and not word_ends
+        return offset + 1 == last[1] or offset == last[1]
+
+    def merge(self, edits, kind, offset, chars):
+        """Append an edit to a record, extending the last edit if adjacent"""
+        last = edits[-1]
+        if kind == last[0] == 'insert' and offset == last[1] + len(last[2]):
+            last[2] += chars
+        elif kind == last[0] == 'delete' and offset + len(chars) == last[1]:
+            last[1], last[2] = offset, chars + last[2]
+        elif kind == last[0] == 'delete' and offset == last[1]:
+            last[2] += chars
+        else:
+            edits.append([kind, offset, chars])
+
+    def resize(self, record):
+        """Recount a record's size after it changed"""
+        if record['packed'] is not None:
+            size = sys.getsizeof(record['packed']) + self.EDIT_OVERHEAD
+        else:
+            size = sum(sys.getsizeof(edit[2]) + self.EDIT_OVERHEAD for edit in record['edits'])
+        self.memory += size - record['size']
+        record['size'] = size
+
+    def enforce_budget(self):
+        """Compress, then drop, the oldest records until under budget"""
+        stack = self.undo_stack
+        while self.memory > self.budget and self.packed < len(stack) - self.KEEP_PLAIN:
+            record = stack[self.packed]
+            if record['size'] >= self.COMPRESS_MIN:
+                record['packed'] = zlib.compress(json.dumps(record['edits']).encode())
+                record['edits'] = None
+                self.resize(record)
+            self.packed += 1
+        while self.memory > self.budget and len(stack) > 1:
+            self.memory -= stack.popleft()['size']
+            self.packed = max(self.packed - 1, 0)
+
+    def unpack(self, record):
+        """Return a record's edits, decompressing them if needed"""
+        if record['packed'] is not None:
+            record['edits'] = json.loads(zlib.decompress(record['packed']))
+            record['packed'] = None
+            self.resize(record)
+        return record['edits']
+
+    def undo(self):
+        """Move the newest record to the redo stack and return its edits"""
+        if not self.undo_stack:
+            return None
+        record = self.undo_stack.pop()
+        self.packed = min(self.packed, len(self.undo_stack))
+        self.redo_stack.append(record)
+        self.open = False
+        return self.unpack(record)
+
+    def redo(self):
+        """Move the newest undone record back and return its edits"""
+        if not self.redo_stack:
+            return None
+        record = self.redo_stack.pop()
+        self.undo_stack.append(record)
+        self.open = False
+        return self.unpack(record)
+
+
+class PythonLexer:
+    """Tokenize Python source one line at a time.
+
+    The state carried from line to line is None, or the quote that opened
+    a string still running at the end of the line (a triple quote, or a
+    single quote continued with a backslash).
+    """
+
+    string_ends = {
+        '"""': re.compile(r'(?:[^"\\]|\\.|"(?!""))*"""'),
+        "'''": re.compile(r"(?:[^'\\]|\\.|'(?!''))*'''"),
+        '"': re.compile(r'(?:[^"\\]|\\.)*"'),
+        "'": re.compile(r"(?:[^'\\]|\\.)*'"),
+    }
+
+    def __init__(self, keywords, builtins):
+        self.keywords = frozenset(keywords)
+        self.builtins = frozenset(builtins)
+        # One alternation for every rule; the group that matched names the tag
+        self.pattern = re.compile('|'.join([
+            r'(?P<comment>#.*)',
+            r'(?P<string>(?:(?<!\w)[rRbBuUfF]{1,2})?(?P<quote>"""|\'\'\'|"|\'))',
+            r'(?P<keyword>\b(?:%s)\b)' % '|'.join(map(re.escape, sorted(self.keywords))),
+            r'(?P<builtin>\b(?:%s)\b)' % '|'.join(map(re.escape, sorted(self.builtins))),
+            r'(?P<number>\b(?:0[xXoObB][0-9a-fA-F_]+|[0-9][0-9_]*(?:\.[0-9_]*)?(?:[eE][+-]?[0-9]+)?[jJ]?)\b)',
+        ]))
+
+    def tokenize_line(self, line, state=None):
+        """Return the (start, end, tag) spans of a line and the state it leaves open"""
+        spans = []
+        pos = 0
+        if state is not None:
+            pos, state = self.continue_string(line, 0, state)
+            if pos:
+                spans.append((0, pos, 'string'))
+            if state is not None:
+                return spans, state
+        
+        search = self.pattern.search
+        match = search(line, pos)
+        while match:
+            tag = match.lastgroup
+            if tag == 'string':
+                end, state = self.continue_string(line, match.end(), match.group('quote'))
+                spans.append((match.start(), end, 'string'))
+                if state is not None:
+                    break
+            else:
+                end = match.end()
+                spans.append((match.start(), end, tag))
+            match = search(line, end)
+        return spans, state
+
+    def continue_string(self, line, pos, quote):
+        """Find where a string opened with quote ends, returning (end, state)"""
+        match = self.string_ends[quote].match(line, pos)
+        if match:
+            return match.end(), None
+        if len(quote) == 3:
+            return len(line), quote
+        # A single-quoted string only runs on if the line ends in a backslash
+        backslashes = len(line) - len(line.rstrip('\\'))
+        return len(line), quote if backslashes % 2 else None
+
+
+class SyntaxHighlighter:
+    """Incremental highlighter driven by a per-line lexer state cache.
+
+    line_states[i] holds the lexer state at the end of line i + 1; lines
+    past scanned have never been tokenized. Edits mark the lines they touch
+    as dirty, and a highlight pass re-tokenizes those lines, only moving on
+    to the following line while the state it leaves behind differs from the
+    cached one. tagged records which lines carry up-to-date tags, so a pass
+    limited to the viewport skips lines it has already tagged. A TokenTable
+    from an earlier session can stand in for the lexer: rows maps each line
+    to a table row, or -1 once the line has changed, and a row is used
+    whenever the state entering the line matches the one it was made with.
+    With max_columns set, only that many characters of each line are
+    tokenized.
+    """
+
+    UNKNOWN = object()
+    FETCH_LINES = 1024
+
+    def __init__(self, lexer):
+        self.lexer = lexer
+        self.max_columns = None
+        self.reset(1)
+
+    def reset(self, line_count):
+        """Forget all cached states and tags"""
+        self.line_states = [self.UNKNOWN] * line_count
+        self.tagged = bytearray(line_count)
+        self.scanned = 0
+        self.dirty = set()
+        self.table = None
+        self.rows = None
+
+    def use_table(self, table, rows):
+        """Take line results from a TokenTable; rows maps lines to table rows"""
+        self.table = table
+        self.rows = rows
+
+    def untag(self):
+        """Forget which lines carry tags, keeping the line states"""
+        self.tagged = bytearray(len(self.line_states))
+
+    def lines_inserted(self, line, count):
+        """Record an insert at line that added count newlines"""
+        # The old line's exit state now belongs to the last line of the insert
+        self.line_states[line - 1:line - 1] = [self.UNKNOWN] * count
+        self.tagged[line - 1:line] = bytes(count + 1)
+        if self.rows is not None:
+            self.rows[line - 1:line] = array('i', [-1]) * (count + 1)
+        if line > self.scanned:
+            return
+        if count:
+            self.dirty = {d + count if d > line else d for d in self.dirty}
+            self.scanned += count
+        self.dirty.update(range(line, line + count + 1))
+
+    def lines_deleted(self, line, count):
+        """Record a delete starting at line that removed count newlines"""
+        # The joined line ends the way the last deleted line ended
+        del self.line_states[line - 1:line - 1 + count]
+        self.tagged[line - 1:line + count] = bytes(1)
+        if self.rows is not None:
+            self.rows[line - 1:line + count] = array('i', [-1])
+        if line > self.scanned:
+            return
+        if count:
+            self.dirty = {d - count if d > line else d
+                          for d in self.dirty if not line < d <= line + count}
+            self.scanned -= min(count, self.scanned - line)
+        self.dirty.add(line)
+
+    def rehighlight(self, get_lines, first=1, last=None):
+        """Bring the tags of lines first..last up to date, yielding (line, spans)
+        
+        get_lines(first, last) returns the text of an inclusive line range,
+        and span columns are Tk index columns. Lines above first are
+        tokenized only as far as needed to know the state entering it; a
+        change still running on past last is left dirty for a later pass.
+        """
+        line_count = len(self.line_states)
+        last = line_count if last is None else min(last, line_count)
+        dirty = sorted(d for d in self.dirty if d <= last)
+        self.dirty.difference_update(dirty)
+        chunk_first = chunk_last = 0
+        lines = []
+        
+        line = self.next_pending(0, dirty, first, last)
+        while line:
+            if not chunk_first <= line <= chunk_last:
+                chunk_first = line
+                chunk_last = min(line + self.FETCH_LINES - 1, last)
+                lines = get_lines(chunk_first, chunk_last)
+            entry = self.line_states[line - 2] if line > 1 else None
+            row = self.rows[line - 1] if self.rows is not None else -1
+            if row >= 0 and self.table.entry(row) == entry:
+                spans, state = self.table.line(row)
+            else:
+                text = lines[line - chunk_first]
+                if self.max_columns:
+                    text = text[:self.max_columns]
+                spans, state = self.lexer.tokenize_line(text, entry)
+            if line >= first:
+                self.tagged[line - 1] = 1
+                yield line, tk_spans(lines[line - chunk_first], spans)
+            else:
+                self.tagged[line - 1] = 0
+            
+            changed = state != self.line_states[line - 1]
+            self.line_states[line - 1] = state
+            self.scanned = max(self.scanned, line)
+            if changed and line < last:
+                line += 1
+                continue
+            if changed and line < self.scanned:
+                self.dirty.add(line + 1)
+            line = self.next_pending(line, dirty, first, last)
+
+    def first_pending(self, first, last):
+        """Return the first line a pass over first..last would tokenize, or 0"""
+        dirty = sorted(d for d in self.dirty if d <= last)
+        return self.next_pending(0, dirty, first, last)
+
+    def copy(self):
+        """Return an independent copy that a worker thread can advance"""
+        other = copy.copy(self)
+        other.line_states = list(self.line_states)
+        other.tagged = bytearray(self.tagged)
+        other.dirty = set(self.dirty)
+        if self.rows is not None:
+            other.rows = array('i', self.rows)
+        return other
+
+    def next_pending(self, after, dirty, first, last):
+        """Return the next line after `after` that a pass must tokenize, or 0"""
+        # Unscanned lines are always pending, and scanned never trails after
+        candidates = [self.scanned + 1]
+        i = bisect.bisect_right(dirty, after)
+        if i < len(dirty):
+            candidates.append(dirty[i])
+        start = max(after + 1, first)
+        if start <= last:
+            untagged = self.tagged.find(0, start - 1, last)
+            if untagged >= 0:
+                candidates.append(untagged + 1)
+        line = min(candidates)
+        return line if line <= last else 0
+
+
+class TokenTable:
+    """Per-line token spans and lexer states packed into flat arrays.
+
+    Row r's spans are the (start, end, tag) triples in
+    spans[offsets[r] * 3:offsets[r + 1] * 3]; entries and exits hold the
+    lexer state entering and leaving the row as indexes into states.
+    """
+
+    def __init__(self, states=(None,), tags=()):
+        self.states = list(states)
+        self.tags = list(tags)
+        self.offsets = array('I', [0])
+        self.spans = array('I')
+        self.entries = bytearray()
+        self.exits = bytearray()
+
+    def __len__(self):
+        return len(self.entries)
+
+    def code(self, values, value):
+        """Return the index of a state or tag, adding it if new"""
+        try:
+            return values.index(value)
+        except ValueError:
+            values.append(value)
+            return len(values) - 1
+
+    def append(self, entry, spans, state):
+        """Add the next row"""
+        for start, end, tag in spans:
+            self.spans.extend((start, end, self.code(self.tags, tag)))
+        self.offsets.append(self.offsets[-1] + len(spans))
+        self.entries.append(self.code(self.states, entry))
+        self.exits.append(self.code(self.states, state))
+
+    def entry(self, row):
+        """Return the lexer state entering a row"""
+        return self.states[self.entries[row]]
+
+    def line(self, row):
+        """Return a row's spans and the state it leaves open"""
+        flat = self.spans[self.offsets[row] * 3:self.offsets[row + 1] * 3]
+        tags = self.tags
+        spans = [(flat[i], flat[i + 1], tags[flat[i + 2]]) for i in range(0, len(flat), 3)]
+        return spans, self.states[self.exits[row]]
+
+
+class TokenCache:
+    """Directory of highlight results for files opened before.
+
+    Each file's TokenTable is stored zlib-compressed under a name derived
+    from its path, with a header giving the file's size, mtime, content
+    hash and per-block line hashes plus the version of the lexer rules.
+    Blocks end at lines picked by their own hash rather than every so many
+    lines, so an insert or delete only changes the blocks around it and
+    the others are found again wherever they moved. The least recently
+    used files are removed once the directory grows past max_bytes.
+    """
+
+    FORMAT = 2
+    BLOCK_LINES = 256  # average lines per block
+    MAX_BLOCK_LINES = 1024
+
+    def __init__(self, directory, rules, max_bytes=64 << 20):
+        self.directory = directory
+        self.rules = f"{self.FORMAT}:{zlib.crc32(rules.encode()):08x}"
+        self.max_bytes = max_bytes
+
+    def file_for(self, path):
+        """Return the cache file holding a source file's results"""
+        name = hashlib.sha1(os.path.abspath(path).encode('utf-8', 'surrogatepass')).hexdigest()
+        return os.path.join(self.directory, name + '.tokens')
+
+    @classmethod
+    def fingerprint(cls, lines):
+        """Return the content hash and the [crc, line count] of each block of lines"""
+        digest = hashlib.blake2b(digest_size=16)
+        blocks = []
+        crc = count = 0
+        for i, line in enumerate(lines):
+            data = line.encode('utf-8', 'surrogatepass') + b'\n'
+            digest.update(data)
+            crc = zlib.crc32(data, crc)
+            count += 1
+            if zlib.crc32(data) % cls.BLOCK_LINES == 0 or count == cls.MAX_BLOCK_LINES:
+                blocks.append([crc, count])
+                crc = count = 0
+            if i % 2048 == 2047:
+                # Let the UI thread run between blocks
+                time.sleep(0)
+        if count:
+            blocks.append([crc, count])
+        return digest.hexdigest(), blocks
+
+    def load(self, path):
+        """Return (header, table) cached for path, or None"""
+        cache_file = self.file_for(path)
+        try:
+            with open(cache_file, 'rb') as f:
+                data = zlib.decompress(f.read())
+            header_end = data.index(b'\n')
+            header = json.loads(data[:header_end])
+            if header.get('rules') != self.rules or header.get('path') != os.path.abspath(path):
+                return None
+            table = TokenTable(header['states'], header['tags'])
+            pos = header_end + 1
+            for name, typecode, count in (('offsets', 'I', header['lines'] + 1),
+                                          ('spans', 'I', header['span_values'])):
+                values = array(typecode)
+                end = pos + count * values.itemsize
+                values.frombytes(data[pos:end])
+                if len(values) != count:
+                    return None  # truncated
+                setattr(table, name, values)
+                pos = end
+            lines = header['lines']
+            if len(data) != pos + 2 * lines:
+                return None
+            table.entries = bytearray(data[pos:pos + lines])
+            table.exits = bytearray(data[pos + lines:pos + 2 * lines])
+            # Reading a file makes it the most recently used
+            os.utime(cache_file)
+            return header, table
+        except (OSError, ValueError, KeyError, TypeError, zlib.error):
+            return None
+
+    def store(self, path, file_stat, content_hash, blocks, table):
+        """Write the results for path, then trim the directory to size"""
+        header = {
+            'rules': self.rules,
+            'path': os.path.abspath(path),
+            'size': file_stat.st_size,
+            'mtime': file_stat.st_mtime_ns,
+            'hash': content_hash,
+            'blocks': blocks,
+            'lines': len(table),
+            'span_values': len(table.spans),
+            'states': table.states,
+            'tags': table.tags,
+        }
+        payload = b''.join([json.dumps(header).encode(), b'\n', table.offsets.tobytes(),
+                            table.spans.tobytes(), bytes(table.entries), bytes(table.exits)])
+        os.makedirs(self.directory, exist_ok=True)
+        cache_file = self.file_for(path)
+        temp_file = f"{cache_file}.{threading.get_ident()}.tmp"
+        with open(temp_file, 'wb') as f:
+            f.write(zlib.compress(payload, 1))
+        os.replace(temp_file, cache_file)
+        self.evict()
+
+    def rows_for(self, header, blocks, line_count):
+        """Map each line to its cached row where its block is in the cache, moved or not"""
+        rows = array('i', [-1]) * line_count
+        cached = {}
+        row = 0
+        for crc, count in header['blocks']:
+            cached.setdefault((crc, count), row)
+            row += count
+        first = 0
+        for crc, count in blocks:
+            row = cached.get((crc, count))
+            if row is not None:
+                rows[first:first + count] = array('i', range(row, row + count))
+            first += count
+        return rows
+
+    @staticmethod
+    def build(lexer, lines, table=None, rows=None):
+        """Tokenize every line into a new TokenTable, reusing valid cached rows"""
+        new = TokenTable()
+        state = None
+        for i, line in enumerate(lines):
+            row = rows[i] if rows is not None else -1
+            if row >= 0 and table.entry(row) == state:
+                spans, exit_state = table.line(row)
+            else:
+                spans, exit_state = lexer.tokenize_line(line, state)
+            new.append(state, spans, exit_state)
+            state = exit_state
+            if i % 2048 == 2047:
+                # Let the UI thread run between blocks
+                time.sleep(0)
+        return new
+
+    def evict(self):
+        """Remove the least recently used files beyond max_bytes"""
+        entries = []
+        with os.scandir(self.directory) as it:
+            for entry in it:
+                if entry.name.endswith('.tokens'):
+                    info = entry.stat()
+                    entries.append((info.st_mtime, info.st_size, entry.path))
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.unlink(path)
+                total -= size
+            except OSError:
+                pass
+
+
+class FileLoader:
+    """Read a text file on a background thread in fixed-size chunks.
+
+    Decoded chunks arrive on the chunks queue as (text, bytes_read) pairs,
+    followed by (None, bytes_read) once the file is exhausted or reading
+    failed, in which case error holds the exception.
+    """
+
+    CHUNK_BYTES = 1 << 20
+
+    def __init__(self, path, encoding=None):
+        self.path = path
+        self.stat = os.stat(path)
+        self.size = self.stat.st_size
+        self.encoding = encoding or locale.getpreferredencoding(False)
+        self.chunks = queue.Queue(maxsize=8)
+        self.cancelled = threading.Event()
+        self.error = None
+        self.bytes_read = 0
+        self.longest_line = 0  # characters, as far as the file has been read
+        self.on_loaded = None
+
+    def start(self):
+        """Start the reader thread"""
+        threading.Thread(target=self.run, daemon=True).start()
+        return self
+
+    def cancel(self):
+        """Stop reading at the next chunk boundary"""
+        self.cancelled.set()
+
+    def run(self):
+        """Read, decode and queue the file (reader thread)"""
+        # Same newline handling as a file opened in text mode
+        decoder = io.IncrementalNewlineDecoder(
+            codecs.getincrementaldecoder(self.encoding)(), translate=True)
+        bytes_read = 0
+        tail = 0
+        try:
+            with open(self.path, 'rb') as file:
+                while not self.cancelled.is_set():
+                    data = file.read(self.CHUNK_BYTES)
+                    bytes_read += len(data)
+                    text = decoder.decode(data, final=not data)
+                    if text:
+                        longest, tail = longest_line(text, tail)
+                        self.longest_line = max(self.longest_line, longest)
+                        self.put((text, bytes_read))
+                    if not data:
+                        break
+        except Exception as e:
+            self.error = e
+        self.bytes_read = bytes_read
+        self.put((None, bytes_read))
+
+    def put(self, item):
+        """Queue an item, giving up if the load is cancelled meanwhile"""
+        while not self.cancelled.is_set():
+            try:
+                self.chunks.put(item, timeout=0.1)
+                return
+            except queue.Full:
+                pass
+
+
+class LogTail:
+    """Follow a file that other processes append to.
+
+    A poller thread stats the file every interval and reads whatever was
+    appended past offset, queueing ('append', text, offset) events. The
+    last bytes read are kept and compared before each read, so a rewrite
+    that also grew the file is not taken for an append. A shrink, a new
+    inode or changed bytes queue a 'truncated', 'rotated' or 'changed'
+    event and stop the thread; 'missing' is queued once while the file is
+    gone and 'error' if reading fails.
+    """
+
+    ANCHOR_BYTES = 4096
+    CHUNK_BYTES = 1 << 20
+
+    def __init__(self, path, offset, encoding=None, interval=0.25):
+        self.path = path
+        self.offset = offset
+        self.encoding = encoding or locale.getpreferredencoding(False)
+        self.interval = interval
+        self.events = queue.Queue(maxsize=16)
+        self.stopped = threading.Event()
+        self.decoder = io.IncrementalNewlineDecoder(
+            codecs.getincrementaldecoder(self.encoding)(), translate=True)
+        file_stat = os.stat(path)
+        self.identity = (file_stat.st_dev, file_stat.st_ino)
+        self.mtime = file_stat.st_mtime_ns
+        self.missing = False
+        self.behind = False
+        with open(path, 'rb') as file:
+            self.anchor = self.read_anchor(file)
+
+    def start(self):
+        """Start the poller thread"""
+        threading.Thread(target=self.run, daemon=True).start()
+        return self
+
+    def stop(self):
+        """Stop polling at the next interval"""
+        self.stopped.set()
+
+    def read_anchor(self, file):
+        """Return the bytes just before offset, leaving file positioned at offset"""
+        start = max(0, self.offset - self.ANCHOR_BYTES)
+        file.seek(start)
+        return file.read(self.offset - start)
+
+    def check(self):
+        """Stat the file and read the next appended chunk; return an event or None"""
+        try:
+            file_stat = os.stat(self.path)
+        except FileNotFoundError:
+            if self.missing:
+                return None
+            self.missing = True
+            return ('missing', None, self.offset)
+        self.missing = False
+        if (file_stat.st_dev, file_stat.st_ino) != self.identity:
+            return ('rotated', None, self.offset)
+        if file_stat.st_size < self.offset:
+            return ('truncated', None, self.offset)
+        if file_stat.st_size == self.offset and file_stat.st_mtime_ns == self.mtime:
+            return None
+        
+        with open(self.path, 'rb') as file:
+            if self.read_anchor(file) != self.anchor:
+                return ('changed', None, self.offset)
+            data = file.read(min(file_stat.st_size - self.offset, self.CHUNK_BYTES))
+        self.mtime = file_stat.st_mtime_ns
+        self.offset += len(data)
+        self.anchor = (self.anchor + data)[-self.ANCHOR_BYTES:]
+        self.behind = self.offset < file_stat.st_size
+        text = self.decoder.decode(data)
+        return ('append', text, self.offset) if text else None
+
+    def matches(self, offset):
+        """Return True if the file holds exactly the offset bytes followed so far"""
+        anchor = self.anchor
+        pending, flags = self.decoder.getstate()
+        if offset != self.offset or pending or flags & 1:
+            # Read but not shown yet, or a partial character or line ending
+            return False
+        try:
+            file_stat = os.stat(self.path)
+            if ((file_stat.st_dev, file_stat.st_ino) != self.identity
+                    or file_stat.st_size != offset):
+                return False
+            with open(self.path, 'rb') as file:
+                return self.read_anchor(file) == anchor
+        except OSError:
+            return False
+
+    def run(self):
+        """Poll the file and queue what changed (poller thread)"""
+        try:
+            while not self.stopped.is_set():
+                event = self.check()
+                if event:
+                    self.put(event)
+                    if event[0] not in ('append', 'missing'):
+                        return
+                # A burst bigger than one chunk is read without waiting
+                if not self.behind:
+                    self.stopped.wait(self.interval)
+        except Exception as e:
+            self.put(('error', e, self.offset))
+
+    def put(self, event):
+        """Queue an event, giving up if following stops meanwhile"""
+        while not self.stopped.is_set():
+            try:
+                self.events.put(event, timeout=0.1)
+                return
+            except queue.Full:
+                pass
+
+
+class LineIndex:
+    """Sparse line-offset index over a memory-mapped file.
+
+    Only the byte offset of every STRIDE-th line start is kept, in an
+    array('Q'); lines in between are found by scanning forward from the
+    nearest stored offset. The index is built on a background thread and
+    can be used for the lines covered so far while it is still growing.
+    """
+
+    STRIDE = 64
+    BLOCK_BYTES = 1 << 22
+    NEWLINE = re.compile(b'\n')
+
+    def __init__(self, path, encoding=None):
+        self.path = path
+        self.encoding = encoding or locale.getpreferredencoding(False)
+        self.file = open(path, 'rb')
+        self.size = os.fstat(self.file.fileno()).st_size
+        self.mm = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        self.offsets = array('Q', [0])
+        self.newlines = 0
+        self.indexed_bytes = 0
+        self.complete = False
+        self.cancelled = threading.Event()
+        self.lock = threading.Lock()
+        self.users = 0  # threads reading the mapping
+
+    def start(self):
+        """Start indexing on a background thread"""
+        self.hold()
+        threading.Thread(target=self.build, daemon=True).start()
+        return self
+
+    def hold(self):
+        """Keep the mapping open for a thread until it calls drop; False once closed"""
+        with self.lock:
+            if self.cancelled.is_set():
+                return False
+            self.users += 1
+            return True
+
+    def drop(self):
+        """Let the mapping go, closing it if the index was closed meanwhile"""
+        with self.lock:
+            self.users -= 1
+            if not self.users and self.cancelled.is_set():
+                self.release()
+
+    def build(self):
+        """Record every STRIDE-th line start (indexing thread)"""
+        newlines = 0
+        try:
+            for pos in range(0, self.size, self.BLOCK_BYTES):
+                if self.cancelled.is_set():
+                    return
+                end = min(pos + self.BLOCK_BYTES, self.size)
+                for match in self.NEWLINE.finditer(self.mm, pos, end):
+                    newlines += 1
+                    if newlines % self.STRIDE == 0:
+                        self.offsets.append(match.end())
+                self.newlines = newlines
+                self.indexed_bytes = end
+            self.complete = True
+        finally:
+            self.drop()
+
+    def close(self):
+        """Stop indexing and searching and unmap the file"""
+        self.cancelled.set()
+        with self.lock:
+            if not self.users:
+                self.release()
+
+    def release(self):
+        """Close the mapping and the file"""
+        self.mm.close()
+        self.file.close()
+
+    def line_count(self):
+        """Return the number of lines indexed so far"""
+        return self.newlines + 1 if self.complete else self.newlines
+
+    def line_start(self, line):
+        """Return the byte offset where a line (1-based) starts"""
+        block, skip = divmod(line - 1, self.STRIDE)
+        pos = self.offsets[block]
+        for _ in range(skip):
+            pos = self.mm.find(b'\n', pos) + 1
+        return pos
+
+    def line_of(self, offset):
+        """Return the line containing a byte offset within the indexed part"""
+        block = bisect.bisect_right(self.offsets, offset) - 1
+        base = self.offsets[block]
+        return block * self.STRIDE + 1 + self.mm[base:offset].count(b'\n')
+
+    def decode(self, data):
+        """Decode bytes from the file the way a text-mode read would"""
+        return data.decode(self.encoding, errors='replace').replace('\r\n', '\n')
+
+    def read_lines(self, first, last):
+        """Return the text of lines first..last without the final newline"""
+        start = self.line_start(first)
+        if last < self.newlines + 1:
+            end = self.line_start(last + 1) - 1
+        else:
+            end = self.size
+        return self.decode(self.mm[start:end])
+
+
+class EditJournal:
+    """Append-only log of buffer edits, written on a background thread.
+
+    The first line describes the base the edits apply to: the file as it
+    was on disk (path, size and mtime), or {"file": null} for a buffer
+    that started empty. Each following line is ["i", index, text] or
+    ["d", index, length] with index a Tk "line.col" position and length
+    counted in Tk index columns. Nothing is written, and no thread
+    started, until the first reset.
+    """
+
+    FSYNC_INTERVAL = 1.0  # seconds between fsyncs of the journal
+
+    def __init__(self, path, report_error=None):
+        self.path = path
+        self.report_error = report_error  # called with (what, error) from the journal thread
+        self.records = queue.Queue()
+        self.thread = None
+
+    @staticmethod
+    def header(file_path, file_stat=None):
+        """Describe file_path (or an empty buffer) as a journal base"""
+        if not file_path:
+            return {'file': None}
+        file_stat = file_stat or os.stat(file_path)
+        return {'file': os.path.abspath(file_path),
+                'size': file_stat.st_size, 'mtime': file_stat.st_mtime_ns}
+
+    def reset(self, header, deltas=()):
+        """Start a new journal on top of header with the given edits"""
+        if not self.thread:
+            self.thread = threading.Thread(target=self.run, daemon=True)
+            self.thread.start()
+        self.records.put(('reset', header, list(deltas)))
+
+    def append(self, delta):
+        """Queue one edit for writing"""
+        if self.thread:
+            self.records.put(('append', delta))
+
+    def close(self, remove=False):
+        """Flush outstanding edits, stop the writer and optionally delete the log"""
+        if self.thread:
+            self.records.put(None)
+            self.thread.join()
+            self.thread = None
+        if remove:
+            self.remove(self.path)
+
+    @staticmethod
+    def remove(path):
+        """Delete a journal file if it exists"""
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+    def run(self):
+        """Write queued records in batches (journal thread)"""
+        file = None
+        last_sync = 0
+        while True:
+            batch = [self.records.get()]
+            while True:
+                try:
+                    batch.append(self.records.get_nowait())
+                except queue.Empty:
+                    break
+            
+            try:
+                for record in batch:
+                    if record is None:
+                        if file:
+                            file.close()
+                        return
+                    if record[0] == 'reset':
+                        if file:
+                            file.close()
+                        file = open(self.path, 'w', encoding='utf-8')
+                        file.write(json.dumps(record[1]) + '\n')
+                        for delta in record[2]:
+                            file.write(self.encode(delta))
+                    elif file:
+                        file.write(self.encode(record[1]))
+                if file:
+                    file.flush()
+                    if time.monotonic() - last_sync > self.FSYNC_INTERVAL:
+                        os.fsync(file.fileno())
+                        last_sync = time.monotonic()
+            except Exception as e:
+                if self.report_error:
+                    self.report_error("writing the crash-recovery journal", e)
+                else:
+                    print(f"Error writing journal: {e}", file=sys.stderr)
+                if None in batch:
+                    # Still honour close() so it doesn't wait forever
+                    if file:
+                        file.close()
+                    return
+
+    @staticmethod
+    def encode(delta):
+        """Serialize one edit as a journal line"""
+        return json.dumps(delta, ensure_ascii=False, separators=(',', ':')) + '\n'
+
+    @staticmethod
+    def read(path):
+        """Return (header, edits) from a journal, ignoring a torn last line"""
+        header, deltas = None, []
+        try:
+            with open(path, encoding='utf-8') as file:
+                for line in file:
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        break
+                    if header is None:
+                        header = record
+                    else:
+                        deltas.append(record)
+        except OSError:
+            pass
+        return header, deltas
+
+
+class BufferSearch:
+    """Find every match of a pattern in a text snapshot on a worker thread.
+
+    Line start offsets and then match offsets stream into array('q')
+    indexes in document order, so matches can be counted and located
+    while the scan is still running.
+    """
+
+    CHECK_EVERY = 1024  # matches between checks for cancellation
+
+    def __init__(self, query, pattern, text):
+        self.query = query
+        self.pattern = pattern
+        self.text = text
+        self.line_starts = array('q', [0])
+        self.starts = array('q')
+        self.ends = array('q')
+        self.lines_ready = False
+        self.done = False
+        self.cancelled = threading.Event()
+
+    def start(self):
+        """Start scanning on a worker thread"""
+        threading.Thread(target=self.run, daemon=True).start()
+        return self
+
+    def cancel(self):
+        """Stop scanning as soon as possible"""
+        self.cancelled.set()
+
+    def run(self):
+        """Index line starts, then stream match offsets (worker thread)"""
+        self.line_starts.extend(m.end() for m in re.finditer('\n', self.text))
+        self.lines_ready = True
+        for count, match in enumerate(self.pattern.finditer(self.text)):
+            if count % self.CHECK_EVERY == 0 and self.cancelled.is_set():
+                return
+            if match.end() > match.start():
+                self.starts.append(match.start())
+                self.ends.append(match.end())
+        self.done = True
+
+    def offset(self, line, col):
+        """Convert a line (1-based) and Tk index column into a snapshot offset"""
+        start = self.line_starts[line - 1]
+        return start + text_column(self.text[start:start + col], col)
+
+    def index(self, offset):
+        """Convert a snapshot offset into a Tk index"""
+        line = bisect.bisect_right(self.line_starts, offset)
+        start = self.line_starts[line - 1]
+        return f"{line}.{tk_column(self.text[start:offset], offset - start)}"
+
+
+class MappedSearch:
+    """Find the next match of a pattern in a LineIndex's file on a worker thread.
+
+    The mapping is scanned a block at a time from start to the end, then
+    from the top back to start. span becomes the match's byte offsets, or
+    stays None if there is none, and done is set when the scan stops; pos
+    tracks progress while it runs.
+    """
+
+    BLOCK_BYTES = 1 << 22
+
+    def __init__(self, index, query, pattern, start):
+        self.index = index
+        self.query = query
+        self.pattern = pattern
+        self.regex = query[1]
+        self.start_pos = self.pos = start
+        self.span = None
+        self.done = False
+        self.cancelled = threading.Event()
+
+    def start(self):
+        """Start scanning on a worker thread"""
+        threading.Thread(target=self.run, daemon=True).start()
+        return self
+
+    def cancel(self):
+        """Stop scanning after the current block"""
+        self.cancelled.set()
+
+    def run(self):
+        """Scan the mapping while holding it open (worker thread)"""
+        index = self.index
+        if not index.hold():
+            self.done = True
+            return
+        try:
+            self.span = self.scan(index.mm, index.size, index.cancelled)
+        finally:
+            index.drop()
+            self.done = True
+
+    def scan(self, mm, size, closed):
+        """Return the span of the first match from start_pos on, wrapping once"""
+        pos, start, wrapped = self.pos, self.start_pos, False
+        while not (self.cancelled.is_set() or closed.is_set()):
+            end = min(pos + self.BLOCK_BYTES, size)
+            match = self.pattern.search(mm, pos, end)
+            if match:
+                return match.span()
+            # Overlap blocks so a match straddling a boundary is still seen; a
+            # regex match has no length bound, so restart at the last line break
+            if self.regex:
+                line_break = mm.rfind(b'\n', pos, end)
+                resume = line_break + 1 if line_break >= 0 else end
+            else:
+                resume = end - len(self.pattern.pattern) + 1
+            pos = max(resume, pos + 1)
+            if end >= size:
+                if wrapped or start == 0:
+                    return None
+                wrapped, pos = True, 0
+            elif wrapped and pos >= start:
+                return None
+            self.pos = pos
+        return None
+
+
+class FileSearch:
+    """Search the files under a directory in batches on a process pool.
+
+    A walker thread lists the files that are not ignored and submits them in
+    batches, small at first so the first hits arrive quickly. Lists of hits
+    stream onto the results queue as batches finish, followed by None.
+    """
+
+    FIRST_BATCH = 8
+    MAX_BATCH = 256
+    MAX_PENDING = 32  # batches in flight before the walker waits
+
+    def __init__(self, root, query):
+        self.root = root
+        self.query = query
+        self.results = queue.Queue()
+        self.cancelled = threading.Event()
+        self.files = 0
+        self.error = None
+
+    def start(self):
+        """Start the walker thread"""
+        threading.Thread(target=self.run, daemon=True).start()
+        return self
+
+    def cancel(self):
+        """Stop submitting batches and drop those not yet started"""
+        self.cancelled.set()
+
+    def run(self):
+        """Walk the tree and fan batches out to the pool (walker thread)"""
+        pending = set()
+        try:
+            # Forking a process with Tk and other threads running can deadlock the child
+            context = multiprocessing.get_context('spawn')
+            with futures.ProcessPoolExecutor(mp_context=context) as pool:
+                batch, size = [], self.FIRST_BATCH
+                for path in walk_files(self.root, ignore_patterns(self.root)):
+                    if self.cancelled.is_set():
+                        break
+                    batch.append(path)
+                    self.files += 1
+                    if len(batch) >= size:
+                        pending.add(pool.submit(search_files, batch, self.query))
+                        batch, size = [], min(size * 2, self.MAX_BATCH)
+                        pending = self.collect(pending, self.MAX_PENDING)
+                if batch and not self.cancelled.is_set():
+                    pending.add(pool.submit(search_files, batch, self.query))
+                while pending and not self.cancelled.is_set():
+                    pending = self.collect(pending, len(pending) - 1)
+                # Drop the batches not yet started (shutdown's cancel_futures needs 3.9)
+                for future in pending:
+                    future.cancel()
+        except Exception as e:
+            self.error = e
+        self.results.put(None)
+
+    def collect(self, pending, limit):
+        """Queue the hits of finished batches, waiting while over limit"""
+        timeout = None if len(pending) > limit else 0
+        done, pending = futures.wait(
+            pending, timeout=timeout, return_when=futures.FIRST_COMPLETED)
+        for future in done:
+            hits = future.result()
+            if hits:
+                self.results.put(hits)
+        return pending
+
+
+class SymbolIndex:
+    """Outline of Python source built one top-level block at a time.
+
+    The text is cut into blocks at lines that start in column 0 outside
+    any string or bracket, as the lexer sees it, and each block is parsed
+    with ast on its own. Results are cached under the block's text, so
+    after an edit only the blocks whose text changed are parsed again. A
+    block that does not parse alone, such as a decorator or one left
+    unfinished mid-edit, is joined with the blocks after it until it does.
+    Symbols are (line, col, kind, name, depth) tuples, with methods and
+    nested classes named Class.name.
+    """
+
+    MAX_JOIN = 16
+    BLOCK_START = re.compile(r'(?!(?:else|elif|except|finally)\b)[^\s#)\]}]')
+    # Always a new block, so a bracket left open while typing only runs on to the next one
+    DEFINITION = re.compile(r'(?:async\s+def|def|class)\b|@\w')
+
+    def __init__(self, lexer):
+        self.lexer = lexer
+        self.cache = {}
+
+    def block_starts(self, lines):
+        """Return the index of each line that starts a top-level block"""
+        starts = [0]
+        state = None
+        depth = 0
+        for i, line in enumerate(lines):
+            if i and state is None:
+                if self.DEFINITION.match(line):
+                    depth = 0
+                    starts.append(i)
+                elif not depth and self.BLOCK_START.match(line):
+                    starts.append(i)
+            code = line
+            # Only a quote can open or close a string, and brackets in
+            # strings and comments do not count
+            if state is not None or '"' in line or "'" in line or '#' in line:
+                spans, state = self.lexer.tokenize_line(line, state)
+                for start, end, tag in reversed(spans):
+                    if tag in ('string', 'comment'):
+                        code = code[:start] + code[end:]
+            depth += code.count('(') + code.count('[') + code.count('{')
+            depth = max(depth - code.count(')') - code.count(']') - code.count('}'), 0)
+        return starts
+
+    def update(self, text):
+        """Return the symbols of text in order, reparsing only changed blocks"""
+        lines = text.split('\n')
+        starts = self.block_starts(lines)
+        starts.append(len(lines))
+        cache = {}
+        symbols = []
+        i = 0
+        while i < len(starts) - 1:
+            found = None
+            for j in range(i + 1, min(i + 1 + self.MAX_JOIN, len(starts))):
+                block = '\n'.join(lines[starts[i]:starts[j]])
+                if block in cache:
+                    found = cache[block]
+                elif block in self.cache:
+                    found = cache[block] = self.cache[block]
+                else:
+                    found = cache[block] = self.parse(block)
+                if found is not None:
+                    break
+            if found is None:
+                # Not valid even joined up, most likely mid-edit; skip the block
+                found, j = [], i + 1
+            first = starts[i]
+            symbols.extend((first + line, col, kind, name, depth)
+                           for line, col, kind, name, depth in found)
+            i = j
+        self.cache = cache
+        return symbols
+
+    @staticmethod
+    def parse(block):
+        """Return the symbols of one block with lines counted from 1, or None"""
+        try:
+            tree = ast.parse(block)
+        except (SyntaxError, ValueError):
+            return None
+        symbols = []
+        
+        def visit(body, depth, prefix):
+            for node in body:
+                if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)):
+                    symbols.append((node.lineno, node.col_offset, 'def', prefix + node.name, depth))
+                elif isinstance(node, ast.ClassDef):
+                    symbols.append((node.lineno, node.col_offset, 'class', prefix + node.name, depth))
+                    visit(node.body, depth + 1, f"{prefix}{node.name}.")
+                elif depth == 0 and isinstance(node, (ast.Assign, ast.AnnAssign)):
+                    targets = node.targets if isinstance(node, ast.Assign) else [node.target]
+                    for target in targets:
+                        for name in ast.walk(target):
+                            if isinstance(name, ast.Name):
+                                symbols.append((name.lineno, name.col_offset, 'variable', name.id, 0))
+        
+        visit(tree.body, 0, "")
+        return symbols
+
+
+def buffer_attribute(name):
+    """Return a property that reads and writes name on the active buffer"""
+    return property(lambda self: getattr(self.buffer, name),
+                    lambda self, value: setattr(self.buffer, name, value))
+
+
+class Buffer:
+    """One tab: a file and the state of editing it.
+
+    A buffer gets a text widget the first time its tab is shown and keeps
+    it while the tab is hidden, along with the document, undo history and
+    highlighter that track it. Under memory pressure a hidden buffer gives
+    the widget up: a clean file is dropped back to disk and read again when
+    the tab is next shown, anything else is frozen into a zlib-compressed
+    snapshot of its text. cursor and top remember the view either way.
+    Each buffer has its own crash-recovery journal and its own save in
+    flight, so neither is disturbed by switching tabs.
+    """
+
+    def __init__(self, number, path, history, highlighter, journal):
+        self.number = number
+        self.current_file = path
+        self.history = history
+        self.highlighter = highlighter
+        self.journal = journal
+        self.save_thread = None
+        self.save_snapshot = None
+        self.save_deltas = None  # edits made while a save is in flight
+        self.pending_save = None
+        self.document = Document()
+        self.metrics = BufferMetrics(self.document)
+        self.text = None
+        self.text_command = None
+        self.tab = None
+        self.file_end = None
+        self.large_file = None
+        self.window_first = self.window_last = 1
+        self.long_lines = False
+        self.symbol_index = SymbolIndex(highlighter.lexer)
+        self.symbols = None  # until the first index pass finishes
+        self.snapshot = None
+        self.modified = False
+        self.cursor = '1.0'
+        self.top = '1.0'
+        self.last_used = 0
+
+    def name(self):
+        """Return the label for the buffer's tab"""
+        return os.path.basename(self.current_file) if self.current_file else "Untitled"
+
+    def memory(self):
+        """Estimate the bytes the buffer holds"""
+        if self.snapshot is not None:
+            size = len(self.snapshot)
+        elif self.text:
+            # The widget keeps its own copy of the text plus per-line overhead
+            size = 2 * len(self.document) + 64 * self.document.line_count()
+        else:
+            size = 0
+        return size + self.history.memory_usage() + 8 * len(self.highlighter.line_states)
+
+    def freeze(self):
+        """Swap the document's text for a compressed snapshot"""
+        self.snapshot = zlib.compress(self.document.text().encode('utf-8', 'surrogatepass'), 1)
+        self.document.set_text('')
+
+    def thaw(self):
+        """Refill the document from the snapshot and return its text"""
+        text = zlib.decompress(self.snapshot).decode('utf-8', 'surrogatepass')
+        self.snapshot = None
+        self.document.set_text(text)
+        self.metrics = BufferMetrics(self.document)
+        return text
+
 
 class TextEditor:
+    TAG_BATCH = 4096  # index pairs handed to a single tag_add call
+    SLICE_LINES = 64  # lines tagged between checks of the time budget
+    HIGHLIGHT_POLL_MS = 15
+    LOAD_POLL_MS = 10
+    WINDOW_LINES = 2000  # lines of a large file kept in the widget
+    WINDOW_EDGE = 200  # repage when the view gets this close to a window edge
+    SAVE_POLL_MS = 20
+    ERROR_POLL_MS = 500
+    SEARCH_POLL_MS = 50
+    FOLLOW_POLL_MS = 200
+    FOLLOW_BATCH_CHARS = 1 << 20  # appended text inserted by one poll
+    TOKEN_CACHE_MIN_LINES = 2000  # smaller files highlight faster than the cache loads
+    INDEX_POLL_MS = 200
+    SYMBOL_DELAY_MS = 400  # pause in typing before the outline is brought up to date
+    SYMBOL_POLL_MS = 50
+    MAX_PALETTE_ITEMS = 200
+
+    # Per-tab state lives on the active Buffer
+    text = buffer_attribute('text')
+    text_command = buffer_attribute('text_command')
+    document = buffer_attribute('document')
+    metrics = buffer_attribute('metrics')
+    history = buffer_attribute('history')
+    highlighter = buffer_attribute('highlighter')
+    current_file = buffer_attribute('current_file')
+    file_end = buffer_attribute('file_end')
+    large_file = buffer_attribute('large_file')
+    window_first = buffer_attribute('window_first')
+    window_last = buffer_attribute('window_last')
+    long_lines = buffer_attribute('long_lines')
+    journal = buffer_attribute('journal')
+    save_thread = buffer_attribute('save_thread')
+    save_snapshot = buffer_attribute('save_snapshot')
+    save_deltas = buffer_attribute('save_deltas')
+    pending_save = buffer_attribute('pending_save')
+    OVERLAY_REFRESH_MS = 500
+    SELECTION_WORD_LIMIT = 1 << 20  # words are counted in selections up to this size
+    MAX_FILE_HITS = 50000  # Find in Files stops once this many hits are listed
+    SEARCH_DELAY_MS = 150  # pause in typing before find-as-you-type runs
+    MAX_VISIBLE_MATCHES = 5000  # matches tagged in the viewport at most
+
     def __init__(self, root):
         self.root = root
         self.setup_window()
@@ -14,10 +2150,13 @@ class TextEditor:
         self.create_widgets()
         self.setup_menu()
         self.setup_bindings()
-        self.load_session()
+        session = self.load_session()
         
         # Apply theme after everything is created
         self.apply_theme()
+        # Let the window appear before the previous file is restored
+        self.root.after_idle(self.restore_session, session)
+        self.root.after(self.ERROR_POLL_MS, self.poll_background_errors)
 
     def setup_window(self):
         """Configure the main window"""
@@ -27,12 +2166,72 @@ class TextEditor:
 
     def setup_variables(self):
         """Initialize editor variables"""
-        self.current_file = None
+        self.buffers = []  # tabs in display order
+        self.buffer = None
+        # Journals a session that did not exit cleanly left behind; new tabs number past them
+        self.old_journals = self.find_journals()
+        self.buffer_numbers = itertools.count(self.old_journals[-1][0] + 1 if self.old_journals else 0)
+        self.buffer_clock = itertools.count(1)  # stamps last_used for LRU eviction
+        self.buffer_budget = 256 << 20  # bytes hidden tabs may hold before eviction
+        self.text_font = ('Consolas', 12)
+        self.edit_listeners = [self.on_text_edit, self.journal_edit, self.history_edit]
         self.auto_save = False
         self.auto_save_interval = 300000  # 5 minutes
+        self.undo_budget = 32 << 20  # bytes of undo history before compressing
         self.dark_mode = False
         self.session_file = "editor_session.json"
+        self.journal_file = "editor_session.{}.journal"  # one per tab, by buffer number
         self.syntax_highlighting = True
+        self.highlight_visible_only = True
+        self.highlight_margin = 50  # lines highlighted beyond the viewport
+        self.highlight_job = None
+        self.highlight_generation = 0
+        self.highlight_busy = False
+        self.highlight_rerun = False
+        self.highlight_inline_lines = 200  # smaller passes skip the worker
+        self.highlight_slice_ms = 8
+        self.pending_spans = deque()
+        self.background_errors = queue.Queue()
+        self.highlight_jobs = queue.Queue()
+        self.highlight_results = queue.Queue()
+        threading.Thread(target=self.highlight_worker, daemon=True).start()
+        self.token_results = queue.Queue()
+        self.file_loader = None
+        self.load_job = None
+        self.load_slice_ms = 30  # time spent inserting chunks per poll
+        self.large_file_threshold = 64 * 1024 * 1024  # bytes
+        self.long_line_threshold = 10000  # characters in one line that turn on long-line mode
+        self.long_line_columns = 2000  # characters of each line highlighted in long-line mode
+        self.split_width = 200  # row length in the split long lines view
+        self.split_view = None
+        self.index_job = None
+        self.repage_job = None
+        self.large_search = None
+        self.follow = None
+        self.follow_job = None
+        self.follow_trimmed = False
+        self.follow_max_lines = 100000
+        self.save_results = queue.Queue()
+        self.save_poll_job = None
+        self.search_job = None
+        self.search_delay_job = None
+        self.search_poll_job = None
+        self.search_stale = False
+        self.search_jump = False
+        self.current_match = -1
+        self.status_job = None
+        self.overlay = None
+        self.profiler = None
+        self.session_restored = False
+        self.file_search = None
+        self.file_hits = []
+        self.symbol_job = None
+        self.symbols_pending = 0
+        self.symbol_jobs = queue.Queue()
+        self.symbol_results = queue.Queue()
+        threading.Thread(target=self.symbol_worker, daemon=True).start()
+        self.palette = None
+        self.palette_matches = []
 
     def setup_theme(self):
         """Define color themes and syntax highlighting colors"""
@@ -79,23 +2278,51 @@ class TextEditor:
             'set', 'setattr', 'slice', 'sorted', 'staticmethod', 'str',
             'sum', 'super', 'tuple', 'type', 'vars', 'zip'
         ]
+        
+        self.lexer = PythonLexer(self.python_keywords, self.python_builtins)
+        # Token cache next to the session file, invalidated when the rules change
+        self.token_cache = TokenCache(
+            os.path.join(os.path.dirname(os.path.abspath(self.session_file)), 'editor_cache'),
+            self.lexer.pattern.pattern)
 
     def create_widgets(self):
         """Create all UI widgets"""
-        # Main text area
+        # Tab bar
+        self.tab_bar = tk.Frame(self.root)
+        self.tab_bar.pack(fill=tk.X)
+        self.tab_var = tk.IntVar()
+        
+        # Main text area; each tab packs its own widget here when shown
         self.text_frame = tk.Frame(self.root)
         self.text_frame.pack(fill=tk.BOTH, expand=True)
+        self.show_buffer(self.add_buffer())
         
-        self.text = scrolledtext.ScrolledText(
-            self.text_frame,
-            wrap=tk.WORD,
-            font=('Consolas', 12),
-            undo=True,
-            maxundo=-1
+        # Status bar
+        self.status = tk.StringVar()
+        self.status.set("Ready")
+        self.statusbar = tk.Label(
+            self.root,
+            textvariable=self.status,
+            relief=tk.SUNKEN,
+            anchor=tk.W
         )
-        self.text.pack(fill=tk.BOTH, expand=True)
+        self.statusbar.pack(side=tk.BOTTOM, fill=tk.X)
         
-        # Find/replace panel (hidden by default)
+        # Cursor position and document metrics, kept apart from messages
+        self.metrics_status = tk.StringVar()
+        self.metrics_bar = tk.Label(self.statusbar, textvariable=self.metrics_status, anchor=tk.E)
+        self.metrics_bar.pack(side=tk.RIGHT)
+        
+        # Rarely used panels are built on first use
+        self.find_frame = None
+        self.results_frame = None
+        self.outline_frame = None
+        self.outline_symbols = None
+
+    def build_find_panel(self):
+        """Create the find/replace panel the first time it is needed"""
+        if self.find_frame:
+            return
         self.find_frame = tk.Frame(self.root)
         
         tk.Label(self.find_frame, text="Find:").pack(side=tk.LEFT)
@@ -112,18 +2339,301 @@ class TextEditor:
         tk.Button(self.find_frame, text="Replace All", command=self.replace_all).pack(side=tk.LEFT, padx=5)
         
         self.case_sensitive = tk.IntVar()
-        tk.Checkbutton(self.find_frame, text="Case Sensitive", variable=self.case_sensitive).pack(side=tk.LEFT, padx=5)
+        tk.Checkbutton(self.find_frame, text="Case Sensitive", variable=self.case_sensitive,
+                       command=self.start_search).pack(side=tk.LEFT, padx=5)
+        self.whole_word = tk.IntVar()
+        tk.Checkbutton(self.find_frame, text="Whole Word", variable=self.whole_word,
+                       command=self.start_search).pack(side=tk.LEFT, padx=5)
+        self.regex_search = tk.IntVar()
+        tk.Checkbutton(self.find_frame, text="Regex", variable=self.regex_search,
+                       command=self.start_search).pack(side=tk.LEFT, padx=5)
         
-        # Status bar
-        self.status = tk.StringVar()
-        self.status.set("Ready")
-        self.statusbar = tk.Label(
-            self.root,
-            textvariable=self.status,
-            relief=tk.SUNKEN,
-            anchor=tk.W
+        self.find_entry.bind("<KeyRelease>", self.on_find_entry_key)
+        self.find_entry.bind("<Return>", lambda e: self.find_text())
+        self.find_entry.bind("<Shift-Return>", lambda e: self.find_previous())
+        
+        self.theme_find_panel()
+
+    def build_outline_panel(self):
+        """Create the outline side panel the first time it is needed"""
+        if self.outline_frame:
+            return
+        self.outline_frame = tk.Frame(self.root)
+        tk.Label(self.outline_frame, text="Outline", anchor=tk.W).pack(fill=tk.X)
+        self.outline_list = tk.Listbox(self.outline_frame, width=32, activestyle=tk.NONE)
+        outline_scroll = tk.Scrollbar(self.outline_frame, command=self.outline_list.yview)
+        self.outline_list.config(yscrollcommand=outline_scroll.set)
+        outline_scroll.pack(side=tk.RIGHT, fill=tk.Y)
+        self.outline_list.pack(fill=tk.BOTH, expand=True)
+        self.outline_list.bind("<ButtonRelease-1>", self.open_outline_item)
+        self.outline_list.bind("<Return>", self.open_outline_item)
+
+    def build_results_panel(self):
+        """Create the Find in Files results panel the first time it is needed"""
+        if self.results_frame:
+            return
+        self.results_frame = tk.Frame(self.root)
+        results_bar = tk.Frame(self.results_frame)
+        results_bar.pack(fill=tk.X)
+        self.results_label = tk.Label(results_bar, anchor=tk.W)
+        self.results_label.pack(side=tk.LEFT, fill=tk.X, expand=True)
+        tk.Button(results_bar, text="Close", command=self.hide_results_panel).pack(side=tk.RIGHT)
+        tk.Button(results_bar, text="Cancel", command=self.cancel_file_search).pack(side=tk.RIGHT, padx=5)
+        
+        self.results_list = tk.Listbox(self.results_frame, height=10, activestyle=tk.NONE)
+        results_scroll = tk.Scrollbar(self.results_frame, command=self.results_list.yview)
+        self.results_list.config(yscrollcommand=results_scroll.set)
+        results_scroll.pack(side=tk.RIGHT, fill=tk.Y)
+        self.results_list.pack(fill=tk.BOTH, expand=True)
+        self.results_list.bind("<ButtonRelease-1>", self.open_file_hit)
+        self.results_list.bind("<Return>", self.open_file_hit)
+
+    def create_text_widget(self):
+        """Give the active buffer its text widget"""
+        text = scrolledtext.ScrolledText(
+            self.text_frame,
+            wrap=tk.WORD,
+            font=self.text_font,
+            undo=False
         )
-        self.statusbar.pack(side=tk.BOTTOM, fill=tk.X)
+        text.config(yscrollcommand=lambda first, last: self.on_text_scroll(text, first, last))
+        text.hbar = None
+        # A tab thawed after eviction keeps the long-line mode it had
+        self.configure_long_lines(text)
+        self.text = text
+        self.setup_edit_tracking()
+        
+        text.bind("<<Undo>>", self.undo_edit)
+        text.bind("<<Redo>>", self.redo_edit)
+        # Edits already schedule highlighting; these only track the cursor
+        for sequence in ("<KeyRelease>", "<ButtonRelease-1>", "<<Selection>>"):
+            text.bind(sequence, self.schedule_status, add='+')
+        text.tag_config('found', background='yellow')
+        self.theme_text(text)
+
+    def destroy_text_widget(self, buffer):
+        """Destroy a buffer's text widget along with its edit proxy"""
+        widget = buffer.text._w
+        buffer.text.frame.destroy()
+        self.root.tk.deletecommand(widget)
+        buffer.text = buffer.text_command = None
+
+    def setup_edit_tracking(self):
+        """Route the text widget's insert/delete commands through Python"""
+        buffer = self.buffer
+        widget = self.text._w
+        self.text_command = widget + "_orig"
+        self.root.tk.call("rename", widget, self.text_command)
+        self.root.tk.createcommand(widget, lambda *args: self.route_text_command(buffer, args))
+
+    def route_text_command(self, buffer, args):
+        """Send the active tab's widget commands through the edit proxy"""
+        if buffer is self.buffer:
+            return self.dispatch_text_command(*args)
+        # Hidden tabs are only restyled, never edited
+        return self.root.tk.call((buffer.text_command,) + args)
+
+    def dispatch_text_command(self, *args):
+        """Forward a widget command to Tk, reporting any edit it makes"""
+        if PERF.enabled:
+            PERF.count_tcl(' '.join(args[:2]) if args[0] in ('tag', 'mark', 'edit') else args[0])
+        try:
+            if args[0] in ('insert', 'delete', 'replace') and self.text_disabled():
+                return ""
+            
+            if args[0] == 'insert' and len(args) > 2:
+                start = self.raw_index(args[1])
+                if self.raw_compare(start, '>=', 'end'):
+                    start = self.raw_index('end-1c')
+                chars = ''.join(args[2::2])
+                result = self.root.tk.call((self.text_command, 'insert', start) + args[2:])
+                if chars:
+                    self.notify_edit('insert', start, chars)
+                return result
+            
+            if args[0] == 'delete' and len(args) > 1:
+                if len(args) > 3:
+                    # Several ranges: delete them back to front one at a time
+                    ranges = [(self.raw_index(args[i]), self.raw_index(args[i + 1]))
+                              for i in range(1, len(args) - 1, 2)]
+                    for first, last in sorted(ranges, key=self.index_key, reverse=True):
+                        self.dispatch_text_command('delete', first, last)
+                    return ""
+                start = self.raw_index(args[1])
+                end = self.raw_index(args[2] if len(args) > 2 else f"{start}+1c")
+                if self.raw_compare(end, '>', 'end-1c'):
+                    end = self.raw_index('end-1c')
+                if not self.raw_compare(start, '<', end):
+                    return ""
+                chars = self.root.tk.call(self.text_command, 'get', start, end)
+                result = self.root.tk.call(self.text_command, 'delete', start, end)
+                self.notify_edit('delete', start, chars)
+                return result
+            
+            if args[0] == 'replace' and len(args) > 3:
+                start = self.raw_index(args[1])
+                self.history.begin()
+                try:
+                    self.dispatch_text_command('delete', start, args[2])
+                    return self.dispatch_text_command('insert', start, *args[3:])
+                finally:
+                    self.history.end()
+            
+            if args[0] == 'edit' and len(args) > 1:
+                # The widget keeps no undo stack of its own; UndoHistory does
+                if args[1] == 'undo':
+                    self.undo_edit()
+                elif args[1] == 'redo':
+                    self.redo_edit()
+                elif args[1] == 'separator':
+                    self.history.seal()
+                elif args[1] == 'reset':
+                    self.history.clear()
+                if args[1] != 'modified':
+                    return ""
+            
+            return self.root.tk.call((self.text_command,) + args)
+        except tk.TclError:
+            return ""
+
+    def text_disabled(self):
+        """Return True if the widget ignores edits"""
+        return str(self.root.tk.call(self.text_command, 'cget', '-state')) == tk.DISABLED
+
+    def raw_index(self, index):
+        """Resolve an index without going through the edit proxy"""
+        return str(self.root.tk.call(self.text_command, 'index', index))
+
+    def raw_compare(self, index1, op, index2):
+        """Compare two indices without going through the edit proxy"""
+        return self.root.tk.getboolean(
+            self.root.tk.call(self.text_command, 'compare', index1, op, index2))
+
+    @timed
+    def on_text_scroll(self, text, first, last):
+        """Update the scrollbar and highlight lines scrolled into view"""
+        if text is not self.text:
+            # A hidden tab's widget settling its own view
+            text.vbar.set(first, last)
+            return
+        if self.large_file:
+            self.large_file_scrolled()
+            return
+        self.text.vbar.set(first, last)
+        self.schedule_highlight()
+        self.tag_visible_matches()
+
+    def index_key(self, text_range):
+        """Sort key placing ranges in document order"""
+        line, col = text_range[0].split('.')
+        return int(line), int(col)
+
+    def notify_edit(self, kind, start, chars):
+        """Apply an insert or delete at start to the document and tell the listeners"""
+        line, col = map(int, start.split('.'))
+        offset = self.document.index_offset(line, col)
+        if kind == 'insert':
+            self.document.insert(offset, chars)
+        else:
+            self.document.delete(offset, len(chars))
+        self.metrics.edited(kind, offset, chars)
+        for listener in self.edit_listeners:
+            listener(kind, start, chars)
+
+    @timed
+    def on_text_edit(self, kind, start, chars):
+        """Keep the highlighter's line states in step with an edit"""
+        line = int(start.split('.')[0])
+        if (kind == 'insert' and not self.long_lines and not self.file_loader
+                and len(chars) > self.long_line_threshold
+                and longest_line(chars)[0] > self.long_line_threshold):
+            self.set_long_lines(True)
+        if kind == 'insert':
+            self.highlighter.lines_inserted(line, chars.count('\n'))
+        else:
+            self.highlighter.lines_deleted(line, chars.count('\n'))
+        # Results computed or queued for the old text no longer line up
+        self.highlight_generation += 1
+        self.pending_spans.clear()
+        self.schedule_highlight()
+        if not self.file_loader:
+            self.schedule_status()
+            self.schedule_symbols()
+        if self.search_job:
+            self.search_stale = True
+            self.schedule_search(self.SEARCH_DELAY_MS * 2)
+
+    def history_edit(self, kind, start, chars):
+        """Record an edit for undo"""
+        if self.history.applying or self.file_loader or self.large_file or self.follow:
+            return
+        line, col = map(int, start.split('.'))
+        self.history.record(kind, self.document.index_offset(line, col), chars)
+
+    @timed
+    def undo_edit(self, event=None):
+        """Undo the newest record in the undo history"""
+        edits = self.history.undo()
+        if edits is None:
+            self.status.set("Nothing to undo")
+        else:
+            self.apply_history([('delete' if kind == 'insert' else 'insert', offset, chars)
+                                for kind, offset, chars in reversed(edits)])
+        return "break"
+
+    @timed
+    def redo_edit(self, event=None):
+        """Redo the newest undone record"""
+        edits = self.history.redo()
+        if edits is None:
+            self.status.set("Nothing to redo")
+        else:
+            self.apply_history(edits)
+        return "break"
+
+    def apply_history(self, edits):
+        """Apply edits from the undo history without recording them again"""
+        self.history.applying = True
+        try:
+            for kind, offset, chars in edits:
+                start = self.document.index(offset)
+                if kind == 'insert':
+                    self.text.insert(start, chars)
+                    self.text.mark_set(tk.INSERT, f"{start}+{tk_length(chars)}c")
+                else:
+                    self.text.delete(start, f"{start}+{tk_length(chars)}c")
+                    self.text.mark_set(tk.INSERT, start)
+        finally:
+            self.history.applying = False
+        self.text.see(tk.INSERT)
+
+    def journal_edit(self, kind, start, chars):
+        """Append an edit to the crash-recovery journal"""
+        # Nothing is journaled until restore_session has dealt with earlier journals
+        if self.file_loader or self.large_file or self.follow or not self.session_restored:
+            return
+        delta = ['i', start, chars] if kind == 'insert' else ['d', start, tk_length(chars)]
+        self.journal.append(delta)
+        if self.save_deltas is not None:
+            self.save_deltas.append(delta)
+
+    def report_error(self, what, error):
+        """Log a failure in a worker thread and queue it for the status bar"""
+        print(f"Error {what}: {error}", file=sys.stderr)
+        self.background_errors.put((what, error))
+
+    def poll_background_errors(self):
+        """Show the latest failure reported by a worker thread"""
+        latest = None
+        while True:
+            try:
+                latest = self.background_errors.get_nowait()
+            except queue.Empty:
+                break
+        if latest:
+            what, error = latest
+            self.status.set(f"Error {what}: {error}")
+        self.root.after(self.ERROR_POLL_MS, self.poll_background_errors)
 
     def setup_menu(self):
         """Create the menu bar"""
@@ -137,6 +2647,12 @@ class TextEditor:
         file_menu.add_command(label="Save", command=self.save_file, accelerator="Ctrl+S")
         file_menu.add_command(label="Save As", command=self.save_as)
         file_menu.add_separator()
+        file_menu.add_command(label="Close Tab", command=self.close_buffer, accelerator="Ctrl+W")
+        file_menu.add_command(label="Next Tab", command=lambda: self.cycle_buffers(1),
+                              accelerator="Ctrl+PgDn")
+        file_menu.add_command(label="Previous Tab", command=lambda: self.cycle_buffers(-1),
+                              accelerator="Ctrl+PgUp")
+        file_menu.add_separator()
         
         self.auto_save_var = tk.IntVar(value=self.auto_save)
         file_menu.add_checkbutton(label="Auto Save", variable=self.auto_save_var, 
@@ -147,8 +2663,8 @@ class TextEditor:
         
         # Edit menu
         edit_menu = tk.Menu(self.menubar, tearoff=0)
-        edit_menu.add_command(label="Undo", command=self.text.edit_undo, accelerator="Ctrl+Z")
-        edit_menu.add_command(label="Redo", command=self.text.edit_redo, accelerator="Ctrl+Y")
+        edit_menu.add_command(label="Undo", command=self.undo_edit, accelerator="Ctrl+Z")
+        edit_menu.add_command(label="Redo", command=self.redo_edit, accelerator="Ctrl+Y")
         edit_menu.add_separator()
         edit_menu.add_command(label="Cut", command=self.cut_text, accelerator="Ctrl+X")
         edit_menu.add_command(label="Copy", command=self.copy_text, accelerator="Ctrl+C")
@@ -156,8 +2672,12 @@ class TextEditor:
         edit_menu.add_separator()
         edit_menu.add_command(label="Find", command=self.show_find_panel, accelerator="Ctrl+F")
         edit_menu.add_command(label="Replace", command=self.show_replace_panel, accelerator="Ctrl+H")
+        edit_menu.add_command(label="Find in Files", command=self.find_in_files, accelerator="Ctrl+Shift+F")
         edit_menu.add_separator()
         edit_menu.add_command(label="Select All", command=self.select_all, accelerator="Ctrl+A")
+        edit_menu.add_command(label="Go to Line", command=self.ask_goto_line, accelerator="Ctrl+G")
+        edit_menu.add_command(label="Go to Symbol", command=self.show_symbol_palette,
+                              accelerator="Ctrl+Shift+O")
         self.menubar.add_cascade(label="Edit", menu=edit_menu)
         
         # View menu
@@ -170,6 +2690,28 @@ class TextEditor:
         self.syntax_var = tk.IntVar(value=self.syntax_highlighting)
         view_menu.add_checkbutton(label="Syntax Highlighting", variable=self.syntax_var, 
                                 command=self.toggle_syntax)
+        view_menu.add_separator()
+        self.long_lines_var = tk.BooleanVar(value=False)
+        view_menu.add_checkbutton(label="Long Line Mode", variable=self.long_lines_var,
+                                  command=self.toggle_long_lines)
+        view_menu.add_command(label="Split Long Lines View", command=self.show_split_view)
+        view_menu.add_separator()
+        self.outline_var = tk.BooleanVar(value=False)
+        view_menu.add_checkbutton(label="Outline", variable=self.outline_var,
+                                  command=self.toggle_outline)
+        view_menu.add_separator()
+        self.follow_var = tk.BooleanVar(value=False)
+        view_menu.add_checkbutton(label="Follow File", variable=self.follow_var,
+                                  command=self.toggle_follow, accelerator="Ctrl+Shift+L")
+        self.follow_scroll_var = tk.BooleanVar(value=True)
+        view_menu.add_checkbutton(label="Auto-Scroll While Following", variable=self.follow_scroll_var)
+        view_menu.add_separator()
+        self.overlay_var = tk.BooleanVar(value=False)
+        view_menu.add_checkbutton(label="Performance Overlay", variable=self.overlay_var,
+                                  command=self.toggle_overlay)
+        view_menu.add_command(label="Export Performance Data...", command=self.export_performance)
+        view_menu.add_command(label="Start/Stop Profiling", command=self.toggle_profiler,
+                              accelerator="Ctrl+Shift+P")
         self.menubar.add_cascade(label="View", menu=view_menu)
         
         # Format menu
@@ -200,80 +2742,1083 @@ class TextEditor:
         self.root.bind("<Control-s>", lambda e: self.save_file())
         self.root.bind("<Control-f>", lambda e: self.show_find_panel())
         self.root.bind("<Control-h>", lambda e: self.show_replace_panel())
+        self.root.bind("<Control-F>", lambda e: self.find_in_files())
+        self.root.bind("<Control-P>", lambda e: self.toggle_profiler())
+        self.root.bind("<Control-L>", lambda e: self.toggle_follow())
+        self.root.bind("<Control-w>", lambda e: self.close_buffer())
+        self.root.bind("<Control-Next>", lambda e: self.cycle_buffers(1))
+        self.root.bind("<Control-Prior>", lambda e: self.cycle_buffers(-1))
         self.root.bind("<Control-a>", lambda e: self.select_all())
+        self.root.bind("<Control-g>", lambda e: self.ask_goto_line())
+        self.root.bind("<Control-O>", lambda e: self.show_symbol_palette())
+        self.root.bind("<Escape>", lambda e: self.cancel_load())
+        
+        # Virtual events are shared by every tab's widget
+        self.text.event_add("<<Redo>>", "<Control-y>")
+
+    # Tabs
+    def add_buffer(self, path=None, position=None):
+        """Add a tab, after the active one unless position is given
+        
+        Nothing is read or displayed until the tab is first shown.
+        """
+        number = next(self.buffer_numbers)
+        buffer = Buffer(number, path, UndoHistory(self.undo_budget), SyntaxHighlighter(self.lexer),
+                        EditJournal(self.journal_file.format(number), self.report_error))
+        if position is None:
+            position = self.buffers.index(self.buffer) + 1 if self.buffer else len(self.buffers)
+        self.buffers.insert(position, buffer)
+        buffer.tab = tk.Radiobutton(self.tab_bar, text=buffer.name(), variable=self.tab_var,
+                                    value=buffer.number, indicatoron=False, padx=8,
+                                    command=lambda: self.activate_buffer(buffer))
+        buffer.tab.bind("<Button-2>", lambda e: self.close_buffer(buffer))
+        self.theme_tab(buffer.tab)
+        for other in self.buffers[position:]:
+            other.tab.pack_forget()
+            other.tab.pack(side=tk.LEFT)
+        return buffer
+
+    def find_buffer(self, path):
+        """Return the tab holding path, or None"""
+        path = os.path.abspath(path)
+        for buffer in self.buffers:
+            if buffer.current_file and os.path.abspath(buffer.current_file) == path:
+                return buffer
+        return None
+
+    def buffer_modified(self, buffer):
+        """Return True if a tab has unsaved changes"""
+        if buffer is self.buffer:
+            return bool(self.text.edit_modified()) and not self.file_loader
+        return buffer.modified
+
+    def show_buffer(self, buffer):
+        """Make buffer the active tab and pack its widget, creating it if needed"""
+        self.buffer = buffer
+        buffer.last_used = next(self.buffer_clock)
+        self.tab_var.set(buffer.number)
+        if not buffer.text:
+            self.create_text_widget()
+        self.text.pack(fill=tk.BOTH, expand=True)
+
+    @timed
+    def activate_buffer(self, buffer):
+        """Switch to a tab, refilling its widget if it was evicted"""
+        if buffer is self.buffer:
+            return
+        self.deactivate_buffer()
+        resident = buffer.text is not None
+        self.show_buffer(buffer)
+        if buffer.snapshot is not None:
+            # Undo history and line states survived; only the tags are gone
+            text = buffer.thaw()
+            self.root.tk.call(self.text_command, 'insert', '1.0', text)
+            self.text.edit_modified(buffer.modified)
+            self.highlighter.untag()
+            self.restore_view(buffer)
+        elif not resident and buffer.current_file:
+            self.open_path(buffer.current_file, on_loaded=lambda: self.restore_view(buffer))
+        if len(self.highlighter.line_states) != self.line_count():
+            self.highlighter.reset(self.line_count())
+        
+        self.update_title()
+        self.long_lines_var.set(self.long_lines)
+        self.journal_buffer()
+        self.schedule_status()
+        self.schedule_highlight()
+        if self.large_file and not self.large_file.complete:
+            self.poll_line_index()
+        if self.find_frame and self.find_entry.get():
+            self.schedule_search(self.SEARCH_DELAY_MS)
+        if self.buffer.symbols is None:
+            self.start_symbols()
+        self.refresh_outline()
+        self.refresh_palette()
+        self.text.focus_set()
+        self.evict_buffers()
+
+    def deactivate_buffer(self):
+        """Stop the active tab's background work and hide its widget"""
+        buffer = self.buffer
+        loading = self.stop_load()
+        trimmed = self.stop_follow() and self.follow_trimmed
+        self.cancel_search()
+        self.cancel_large_search()
+        if self.symbol_job:
+            # Index the last edits now; the tab's outline would otherwise stay behind
+            self.start_symbols()
+        for job in ('index_job', 'repage_job'):
+            if getattr(self, job):
+                self.root.after_cancel(getattr(self, job))
+                setattr(self, job, None)
+        # Highlight passes under way belong to this tab
+        self.highlight_generation += 1
+        self.pending_spans.clear()
+        
+        buffer.modified = bool(self.text.edit_modified())
+        self.capture_view()
+        self.text.pack_forget()
+        if loading or trimmed:
+            # Part of the file is not worth keeping; read it again next time
+            self.unload_buffer(buffer)
+
+    def capture_view(self):
+        """Remember the active tab's cursor and scroll position"""
+        if not self.large_file:
+            self.buffer.cursor = self.text.index(tk.INSERT)
+            self.buffer.top = self.text.index('@0,0')
+
+    def restore_view(self, buffer):
+        """Put the cursor and view back where they were when the tab was hidden"""
+        if buffer is self.buffer and not self.large_file:
+            self.text.mark_set(tk.INSERT, buffer.cursor)
+            self.text.yview(buffer.top)
+
+    def unload_buffer(self, buffer):
+        """Drop a hidden tab's widget and text; the file is read again when it is shown"""
+        if buffer.large_file:
+            buffer.large_file.close()
+            buffer.large_file = None
+        if buffer.text:
+            self.destroy_text_widget(buffer)
+        buffer.document.set_text('')
+        buffer.metrics = BufferMetrics(buffer.document)
+        buffer.history = UndoHistory(self.undo_budget)
+        buffer.highlighter = SyntaxHighlighter(self.lexer)
+        buffer.snapshot = None
+        buffer.modified = False
+        buffer.long_lines = False
+        buffer.symbol_index = SymbolIndex(self.lexer)
+        buffer.symbols = None
+
+    def evict_buffers(self):
+        """Free hidden tabs, least recently used first, until they fit buffer_budget"""
+        hidden = sorted((b for b in self.buffers if b is not self.buffer), key=lambda b: b.last_used)
+        total = sum(buffer.memory() for buffer in hidden)
+        for buffer in hidden:
+            if total <= self.buffer_budget:
+                break
+            if not buffer.text or buffer.save_thread:
+                continue
+            before = buffer.memory()
+            if buffer.current_file and not buffer.modified:
+                self.unload_buffer(buffer)
+            else:
+                self.destroy_text_widget(buffer)
+                buffer.freeze()
+            total -= before - buffer.memory()
+
+    def close_buffer(self, buffer=None):
+        """Close a tab, asking first if it has unsaved changes"""
+        buffer = buffer or self.buffer
+        if self.buffer_modified(buffer):
+            if not messagebox.askyesno("Unsaved Changes", f"Close {buffer.name()} without saving?"):
+                return
+        
+        if buffer is self.buffer:
+            if len(self.buffers) == 1:
+                self.add_buffer()
+            position = self.buffers.index(buffer)
+            neighbour = self.buffers[position + 1 if position + 1 < len(self.buffers) else position - 1]
+            self.activate_buffer(neighbour)
+        # The tab's text is about to go, so let a save still writing it finish
+        self.finish_save([buffer])
+        self.buffers.remove(buffer)
+        buffer.tab.destroy()
+        self.unload_buffer(buffer)
+        buffer.journal.close(remove=True)
+
+    def cycle_buffers(self, step):
+        """Show the next or previous tab"""
+        position = self.buffers.index(self.buffer)
+        self.activate_buffer(self.buffers[(position + step) % len(self.buffers)])
+
+    def update_title(self):
+        """Show the active tab's file in the window title and on its tab"""
+        name = self.buffer.name()
+        read_only = " [read-only]" if self.large_file else ""
+        self.root.title(f"PyEdit - {name}{read_only}")
+        self.buffer.tab.config(text=name)
+
+    def journal_buffer(self):
+        """Start the active tab's crash-recovery journal if it has none yet"""
+        # Until restore_session has run, earlier journals may still need reading
+        if not self.session_restored or self.journal.thread:
+            return
+        if not self.text.edit_modified():
+            try:
+                self.journal.reset(EditJournal.header(self.current_file))
+            except OSError:
+                self.journal.reset(EditJournal.header(None))
+        else:
+            # The file on disk is no base for these edits, so journal the whole text
+            self.journal.reset(EditJournal.header(None), [['i', '1.0', self.document.text()]])
+
+    def find_journals(self):
+        """Return (number, path) for each journal in the working directory, by number"""
+        journals = []
+        for name in os.listdir('.'):
+            # editor_session.journal is the single journal from before tabs
+            match = re.fullmatch(r'editor_session(?:\.(\d+))?\.journal', name)
+            if match:
+                journals.append((int(match.group(1) or -1), name))
+        return sorted(journals)
+
+    def set_buffer_modified(self, buffer, modified):
+        """Mark a tab, shown or hidden, as having unsaved changes or not"""
+        buffer.modified = modified
+        if buffer.text:
+            buffer.text.edit_modified(modified)
+
+    # File operations
+    def new_file(self):
+        """Open an untitled file in a new tab"""
+        self.activate_buffer(self.add_buffer())
+        self.status.set("New file created")
+
+    def open_file(self):
+        """Open an existing file"""
+        file_path = filedialog.askopenfilename(
+            filetypes=[("Text Files", "*.txt"), ("Python Files", "*.py"), ("All Files", "*.*")]
+        )
+        
+        if file_path:
+            self.open_in_tab(file_path)
+
+    def open_in_tab(self, file_path, on_loaded=None, activate=True):
+        """Show a file in its own tab, opening one for it if needed
+        
+        An empty untitled tab is reused. on_loaded is called once the file
+        is in the buffer; with activate False the tab is only added.
+        """
+        buffer = self.find_buffer(file_path)
+        if not buffer and self.active_blank() and activate:
+            self.open_path(file_path, on_loaded)
+            return self.buffer
+        if not buffer:
+            buffer = self.add_buffer(file_path)
+        if not activate:
+            return buffer
+        self.activate_buffer(buffer)
+        if on_loaded:
+            if self.file_loader:
+                self.file_loader.on_loaded = on_loaded
+            elif not self.large_file:
+                on_loaded()
+        return buffer
+
+    def active_blank(self):
+        """Return True if the active tab is an empty untitled one"""
+        return (not self.current_file and not self.file_loader and not self.large_file
+                and not self.text.edit_modified() and not len(self.document))
+
+    def open_paths(self, paths):
+        """Open each path in a tab, showing the first"""
+        for i, path in enumerate(paths):
+            self.open_in_tab(path, activate=i == 0)
+
+    @timed
+    def open_path(self, file_path, on_loaded=None):
+        """Load a file into the editor in chunks without blocking the UI
+        
+        on_loaded is called once the whole file is in the buffer.
+        """
+        self.stop_load()
+        self.stop_follow()
+        try:
+            if os.path.getsize(file_path) > self.large_file_threshold:
+                self.open_large_file(LineIndex(file_path))
+                return
+            loader = FileLoader(file_path)
+            loader.on_loaded = on_loaded
+            loader.start()
+        except Exception as e:
+            messagebox.showerror("Error", f"Failed to open file:\n{e}")
+            return
+        
+        self.close_large_file()
+        self.text.delete(1.0, tk.END)
+        self.current_file = file_path
+        self.update_title()
+        # Read-only until the whole file is in; highlighting waits as well
+        self.text.config(state=tk.DISABLED)
+        self.file_loader = loader
+        self.poll_file_load()
+
+    @timed
+    def poll_file_load(self):
+        """Insert the chunks read so far and report progress"""
+        self.load_job = None
+        loader = self.file_loader
+        deadline = time.perf_counter() + self.load_slice_ms / 1000
+        bytes_read = None
+        self.text.config(state=tk.NORMAL)
+        try:
+            while time.perf_counter() < deadline:
+                try:
+                    text, bytes_read = loader.chunks.get_nowait()
+                except queue.Empty:
+                    break
+                if text is None:
+                    self.finish_load()
+                    return
+                if not self.long_lines and loader.longest_line > self.long_line_threshold:
+                    # Before the long line reaches the widget and has to be laid out
+                    self.set_long_lines(True)
+                self.text.insert(tk.END, text)
+        finally:
+            if self.file_loader is loader:
+                self.text.config(state=tk.DISABLED)
         
-        self.text.bind("<KeyRelease>", self.update_status)
+        if bytes_read is not None and loader.size:
+            percent = bytes_read * 100 // loader.size
+            self.status.set(f"Loading {loader.path}: {percent}% (Esc to cancel)")
+        self.load_job = self.root.after(self.LOAD_POLL_MS, self.poll_file_load)
+
+    def finish_load(self):
+        """Make the buffer editable once the reader has finished"""
+        loader = self.file_loader
+        self.file_loader = None
+        self.text.config(state=tk.NORMAL)
+        if loader.error:
+            self.discard_partial_load()
+            messagebox.showerror("Error", f"Failed to open file:\n{loader.error}")
+            return
+        
+        self.text.mark_set(tk.INSERT, '1.0')
+        self.text.see(tk.INSERT)
+        self.text.edit_reset()
+        self.text.edit_modified(False)
+        self.journal.reset(EditJournal.header(loader.path, loader.stat))
+        self.file_end = (loader.path, loader.bytes_read)
+        self.status.set(f"Opened: {loader.path}")
+        self.schedule_status()
+        self.start_symbols()
         if self.syntax_highlighting:
-            self.text.bind("<KeyRelease>", self.highlight_syntax)
+            self.schedule_highlight()
+            self.start_token_cache(loader.path, loader.stat, self.document.snapshot(), seed=True)
+        if loader.on_loaded:
+            loader.on_loaded()
+
+    # Token cache
+    def start_token_cache(self, path, file_stat, snapshot, seed):
+        """Look up and refresh the cached tokens for path on a worker thread"""
+        if not self.syntax_highlighting or snapshot.line_count() < self.TOKEN_CACHE_MIN_LINES:
+            return
+        threading.Thread(
+            target=self.token_cache_worker,
+            args=(path, file_stat, snapshot, seed, self.highlight_generation),
+            daemon=True
+        ).start()
+        if seed:
+            self.root.after(self.HIGHLIGHT_POLL_MS, self.poll_token_cache)
+
+    def token_cache_worker(self, path, file_stat, snapshot, seed, generation):
+        """Hand back reusable cached rows, then store fresh tokens (worker thread)"""
+        cache = self.token_cache
+        # poll_token_cache waits for exactly one result when seeding
+        posted = not seed
+        try:
+            lines = snapshot.text().split('\n')
+            content_hash, blocks = TokenCache.fingerprint(lines)
+            try:
+                cached = cache.load(path)
+                if cached:
+                    header, table = cached
+                    rows = cache.rows_for(header, blocks, len(lines))
+            except Exception as e:
+                # A damaged cache file is just a miss; the fresh tokens replace it
+                self.report_error("reading the token cache", e)
+                cached = None
+            if not cached:
+                table = rows = None
+            if seed:
+                self.token_results.put((generation, table, rows))
+                posted = True
+            if (cached and header.get('hash') == content_hash
+                    and header.get('lines') == len(lines)):
+                if (header['size'], header['mtime']) != (file_stat.st_size, file_stat.st_mtime_ns):
+                    # Same content under a new mtime: only the key changes
+                    cache.store(path, file_stat, content_hash, blocks, table)
+                return
+            table = cache.build(self.lexer, lines, table, rows)
+            cache.store(path, file_stat, content_hash, blocks, table)
+        except Exception as e:
+            self.report_error("updating the token cache", e)
+        finally:
+            if not posted:
+                self.token_results.put((generation, None, None))
+
+    @timed
+    def poll_token_cache(self):
+        """Seed the highlighter with cached rows unless the buffer has moved on"""
+        try:
+            generation, table, rows = self.token_results.get_nowait()
+        except queue.Empty:
+            self.root.after(self.HIGHLIGHT_POLL_MS, self.poll_token_cache)
+            return
+        
+        if (table is None or generation != self.highlight_generation
+                or not self.syntax_highlighting or self.long_lines):
+            return
+        self.highlighter.use_table(table, rows)
+        # Passes planned before the table arrived are dropped and replanned
+        self.highlight_generation += 1
+        self.pending_spans.clear()
+        self.schedule_highlight()
+
+    def stop_load(self):
+        """Abandon a file load in progress, keeping whatever was inserted"""
+        if not self.file_loader:
+            return False
+        self.file_loader.cancel()
+        self.file_loader = None
+        if self.load_job:
+            self.root.after_cancel(self.load_job)
+            self.load_job = None
+        self.text.config(state=tk.NORMAL)
+        return True
+
+    def cancel_load(self):
+        """Cancel the file load in progress and discard the partial buffer"""
+        if self.stop_load():
+            self.discard_partial_load()
+            self.status.set("Loading cancelled")
+
+    def discard_partial_load(self):
+        """Leave an empty untitled buffer after a load that did not finish"""
+        self.text.delete(1.0, tk.END)
+        self.current_file = None
+        self.update_title()
+        self.text.edit_reset()
+        self.text.edit_modified(False)
+        self.journal.reset(EditJournal.header(None))
+
+    def save_file(self):
+        """Save the current file"""
+        if self.large_file:
+            self.status.set("Large file mode is read-only")
+        elif self.follow:
+            self.status.set("Follow mode is read-only")
+        elif self.current_file:
+            self.start_save(self.current_file)
+        else:
+            self.save_as()
+
+    def save_as(self):
+        """Save file with new name"""
+        if self.large_file or self.follow:
+            self.status.set(f"{'Large file' if self.large_file else 'Follow'} mode is read-only")
+            return
+        
+        file_path = filedialog.asksaveasfilename(
+            defaultextension=".txt",
+            filetypes=[("Text Files", "*.txt"), ("Python Files", "*.py"), ("All Files", "*.*")]
+        )
+        
+        if file_path:
+            self.start_save(file_path)
+
+    def start_save(self, file_path, buffer=None):
+        """Snapshot a tab's buffer and write it to file_path on a save thread"""
+        buffer = buffer or self.buffer
+        if buffer is self.buffer and self.file_loader:
+            self.status.set("Wait for the file to finish loading before saving")
+            return
+        if buffer.save_thread:
+            # Fold repeated saves into one that runs when this one is done
+            buffer.pending_save = file_path
+            self.status.set(f"Save queued: {file_path}")
+            return
+        
+        buffer.save_snapshot = buffer.document.snapshot()
+        chunks = buffer.save_snapshot.chunks()
+        self.set_buffer_modified(buffer, False)
+        buffer.save_deltas = []
+        buffer.save_thread = threading.Thread(
+            target=self.save_worker,
+            args=(buffer, file_path, chunks, time.perf_counter()),
+            daemon=True
+        )
+        buffer.save_thread.start()
+        self.status.set(f"Saving: {file_path}")
+        if not self.save_poll_job:
+            self.save_poll_job = self.root.after(self.SAVE_POLL_MS, self.poll_save)
+
+    def save_worker(self, buffer, file_path, chunks, started):
+        """Write the snapshot atomically and report back (save thread)"""
+        try:
+            size = write_atomically(file_path, chunks)
+            self.save_results.put((buffer, file_path, size, time.perf_counter() - started, None))
+        except Exception as e:
+            self.save_results.put((buffer, file_path, 0, 0, e))
+
+    @timed
+    def poll_save(self):
+        """Report finished saves, whichever tab they belong to"""
+        if self.save_poll_job:
+            self.root.after_cancel(self.save_poll_job)
+            self.save_poll_job = None
+        while True:
+            try:
+                result = self.save_results.get_nowait()
+            except queue.Empty:
+                break
+            self.finish_buffer_save(*result)
+        if any(buffer.save_thread for buffer in self.buffers):
+            self.save_poll_job = self.root.after(self.SAVE_POLL_MS, self.poll_save)
+
+    def finish_buffer_save(self, buffer, file_path, size, elapsed, error):
+        """Apply one save's result to its tab and start any save queued behind it"""
+        buffer.save_thread = None
+        save_deltas, buffer.save_deltas = buffer.save_deltas, None
+        snapshot, buffer.save_snapshot = buffer.save_snapshot, None
+        if error:
+            # The journal still describes the old file, which was left intact
+            self.set_buffer_modified(buffer, True)
+            messagebox.showerror("Error", f"Failed to save file:\n{error}")
+        else:
+            # Rebase the journal on the saved file, keeping later edits
+            try:
+                buffer.journal.reset(EditJournal.header(file_path), save_deltas)
+            except OSError as e:
+                print(f"Error resetting journal: {e}")
+            buffer.current_file = file_path
+            buffer.file_end = (file_path, size)
+            if buffer is self.buffer:
+                self.update_title()
+            else:
+                buffer.tab.config(text=buffer.name())
+            megabytes = size / (1024 * 1024)
+            rate = megabytes / elapsed if elapsed else 0
+            self.status.set(
+                f"Saved: {file_path} ({megabytes:.1f} MB in {elapsed:.2f}s, {rate:.1f} MB/s)")
+            # Key the cache on what was written so the next open is a hit
+            try:
+                self.start_token_cache(file_path, os.stat(file_path), snapshot, seed=False)
+            except OSError as e:
+                print(f"Error updating token cache: {e}")
+        
+        if buffer.pending_save:
+            file_path, buffer.pending_save = buffer.pending_save, None
+            self.start_save(file_path, buffer)
+
+    def finish_save(self, buffers=None):
+        """Wait for the saves in flight, and any queued behind them, to complete"""
+        for buffer in buffers or self.buffers:
+            while buffer.save_thread:
+                buffer.save_thread.join()
+                self.poll_save()
+
+    # Follow mode
+    def toggle_follow(self):
+        """Start or stop following the current file"""
+        if not self.follow:
+            self.start_follow()
+            return
+        path, trimmed = self.follow.path, self.follow_trimmed
+        self.stop_follow()
+        if trimmed:
+            # The buffer holds only the newest lines; bring the rest back
+            self.open_path(path)
+        else:
+            self.status.set(f"Stopped following: {path}")
+
+    def start_follow(self):
+        """Append whatever other processes write to the current file"""
+        self.follow_var.set(False)
+        path = self.current_file
+        if self.large_file:
+            self.status.set("Following is not available in large file mode")
+            return
+        if self.file_loader:
+            self.status.set("Wait for the file to finish loading before following it")
+            return
+        if not path or not self.file_end or self.file_end[0] != path:
+            self.status.set("Open or save a file to follow it")
+            return
+        if self.text.edit_modified():
+            self.status.set("Save or discard your changes before following the file")
+            return
+        try:
+            self.follow = LogTail(path, self.file_end[1]).start()
+        except OSError as e:
+            messagebox.showerror("Error", f"Failed to follow file:\n{e}")
+            return
+        
+        self.follow_trimmed = False
+        self.follow_var.set(True)
+        self.text.config(state=tk.DISABLED)
+        if self.follow_scroll_var.get():
+            self.text.see(tk.END)
+        self.status.set(f"Following: {path}")
+        self.follow_job = self.root.after(self.FOLLOW_POLL_MS, self.poll_follow)
+
+    def stop_follow(self):
+        """Stop following, leaving the buffer editable; return True if it was following"""
+        tail, self.follow = self.follow, None
+        self.follow_var.set(False)
+        if not tail:
+            return False
+        tail.stop()
+        if self.follow_job:
+            self.root.after_cancel(self.follow_job)
+            self.follow_job = None
+        self.text.config(state=tk.NORMAL)
+        # Appends were not journaled, so rebase the journal on the file if
+        # the buffer still holds exactly what it does, else on the buffer's text
+        if not self.follow_trimmed and self.file_end and tail.matches(self.file_end[1]):
+            try:
+                self.journal.reset(EditJournal.header(tail.path))
+                return True
+            except OSError:
+                pass
+        self.journal.reset(EditJournal.header(None), [['i', '1.0', self.document.text()]])
+        return True
+
+    @timed
+    def poll_follow(self):
+        """Append the text read since the last poll in one insert"""
+        self.follow_job = None
+        tail = self.follow
+        batch = []
+        size = 0
+        event = None
+        while size < self.FOLLOW_BATCH_CHARS:
+            try:
+                event = tail.events.get_nowait()
+            except queue.Empty:
+                event = None
+                break
+            if event[0] != 'append':
+                break
+            batch.append(event[1])
+            size += len(event[1])
+            self.file_end = (tail.path, event[2])
+        
+        if batch:
+            self.append_followed(''.join(batch))
+        if event and event[0] != 'append':
+            self.follow_changed(event[0], event[1])
+            if self.follow is not tail:
+                return
+        self.follow_job = self.root.after(self.FOLLOW_POLL_MS, self.poll_follow)
+
+    def append_followed(self, text):
+        """Append text at the end of the buffer, dropping lines over follow_max_lines"""
+        self.text.config(state=tk.NORMAL)
+        try:
+            self.text.insert('end-1c', text)
+            excess = self.document.line_count() - self.follow_max_lines
+            if excess > 0:
+                self.text.delete('1.0', f"{excess + 1}.0")
+                self.follow_trimmed = True
+        finally:
+            self.text.config(state=tk.DISABLED)
+        # The buffer still matches the file, up to the lines dropped from the top
+        self.text.edit_modified(False)
+        if self.follow_scroll_var.get():
+            self.text.see('end-1c')
+        self.status.set(f"Following: {self.follow.path} ({self.file_end[1]:,} bytes)")
+
+    def follow_changed(self, kind, error):
+        """Handle a follow event other than an append"""
+        path = self.follow.path
+        if kind == 'missing':
+            self.status.set(f"Following: {path} is gone; waiting for it to reappear")
+            return
+        self.stop_follow()
+        if kind == 'error':
+            messagebox.showerror("Error", f"Stopped following {path}:\n{error}")
+            return
+        
+        reason = {
+            'truncated': "was truncated",
+            'rotated': "was replaced, probably by log rotation",
+            'changed': "was changed other than by appending",
+        }[kind]
+        if messagebox.askyesno("File Changed", f"{path} {reason}.\n\nReload it and keep following?"):
+            self.open_path(path, on_loaded=self.start_follow)
+        else:
+            self.status.set(f"Stopped following: {path} {reason}")
+
+    # Large file mode
+    def open_large_file(self, index):
+        """Page through a file too large for the widget via a line index"""
+        self.close_large_file()
+        self.text.delete(1.0, tk.END)
+        self.large_file = index.start()
+        self.current_file = index.path
+        self.update_title()
+        self.text.vbar.config(command=self.on_large_file_scrollbar)
+        self.text.config(state=tk.DISABLED)
+        self.window_first = self.window_last = 1
+        self.page_to(1)
+        self.poll_line_index()
+
+    def close_large_file(self):
+        """Leave large file mode and unmap the file"""
+        if not self.large_file:
+            return
+        self.large_file.close()
+        self.large_file = None
+        self.cancel_large_search()
+        if self.repage_job:
+            self.root.after_cancel(self.repage_job)
+            self.repage_job = None
+        self.text.vbar.config(command=self.text.yview)
+        self.text.config(state=tk.NORMAL)
+
+    @timed
+    def poll_line_index(self):
+        """Report indexing progress and fill the window as lines arrive"""
+        self.index_job = None
+        index = self.large_file
+        if not index:
+            return
+        window_full = self.window_last - self.window_first + 1 >= self.WINDOW_LINES
+        if not window_full and index.line_count() > self.window_last:
+            self.page_to(self.global_line(self.text.index('@0,0')))
+        
+        lines = f"{index.line_count():,} lines"
+        if index.complete:
+            self.status.set(f"Large file mode (read-only): {lines}")
+            return
+        percent = index.indexed_bytes * 100 // max(index.size, 1)
+        self.status.set(f"Large file mode (read-only): indexing {lines}, {percent}%")
+        self.index_job = self.root.after(self.INDEX_POLL_MS, self.poll_line_index)
+
+    def page_to(self, line):
+        """Load the window of lines around line and scroll it to the top"""
+        index = self.large_file
+        count = max(index.line_count(), 1)
+        line = max(1, min(line, count))
+        insert = self.global_line(self.text.index(tk.INSERT))
+        first = max(1, min(line - self.WINDOW_LINES // 2, count - self.WINDOW_LINES + 1))
+        last = min(first + self.WINDOW_LINES - 1, count)
+        
+        text = index.read_lines(first, last) if index.line_count() else ''
+        self.text.config(state=tk.NORMAL)
+        self.text.delete(1.0, tk.END)
+        self.text.insert(1.0, text)
+        self.text.config(state=tk.DISABLED)
+        self.text.edit_reset()
+        self.text.edit_modified(False)
+        self.window_first, self.window_last = first, last
+        
+        if first <= insert <= last:
+            self.text.mark_set(tk.INSERT, f"{insert - first + 1}.0")
+        self.text.yview(f"{line - first + 1}.0")
+
+    def global_line(self, index):
+        """Translate a widget index into a line number in the large file"""
+        return self.window_first + int(index.split('.')[0]) - 1
+
+    @timed
+    def large_file_scrolled(self):
+        """Map the window's view onto the scrollbar and repage near its edges"""
+        index = self.large_file
+        count = max(index.line_count(), 1)
+        top = int(self.text.index('@0,0').split('.')[0])
+        bottom = int(self.text.index(f'@0,{self.text.winfo_height()}').split('.')[0])
+        global_top = self.window_first + top - 1
+        self.text.vbar.set((global_top - 1) / count,
+                           (global_top + bottom - top) / count)
+        
+        near_top = top < self.WINDOW_EDGE and self.window_first > 1
+        near_bottom = (bottom > self.window_last - self.window_first + 1 - self.WINDOW_EDGE
+                       and self.window_last < index.line_count())
+        if (near_top or near_bottom) and not self.repage_job:
+            self.repage_job = self.root.after_idle(self.repage, global_top)
+
+    @timed
+    def repage(self, line):
+        """Recenter the window on the line at the top of the view"""
+        self.repage_job = None
+        if self.large_file:
+            self.page_to(line)
+
+    def on_large_file_scrollbar(self, *args):
+        """Scroll through the whole file rather than just the window"""
+        if args[0] == 'moveto':
+            line = int(float(args[1]) * self.large_file.line_count()) + 1
+            if self.window_first <= line <= self.window_last - self.WINDOW_EDGE:
+                self.text.yview(f"{line - self.window_first + 1}.0")
+            else:
+                self.page_to(line)
+        else:
+            self.text.yview(*args)
+
+    def find_in_large_file(self, search):
+        """Find the next match in the mapped file on a search worker"""
+        index = self.large_file
+        query = self.search_options()
+        try:
+            pattern = compile_search(*query, encoding=index.encoding)
+        except (re.error, UnicodeEncodeError) as e:
+            self.status.set(f"Invalid pattern: {e}")
+            return
+        previous = self.large_search
+        start = previous.span[1] if previous and previous.query == query and previous.span else 0
+        self.cancel_large_search()
+        self.large_search = MappedSearch(index, query, pattern, start).start()
+        self.status.set(f"Searching for: {search}")
+        self.root.after(self.SEARCH_POLL_MS, self.poll_large_file_search, self.large_search)
+
+    def cancel_large_search(self):
+        """Stop the large file search worker, if one is running"""
+        if self.large_search:
+            self.large_search.cancel()
+            self.large_search = None
+
+    @timed
+    def poll_large_file_search(self, job):
+        """Page to the worker's match once the line index reaches it"""
+        index = self.large_file
+        if job is not self.large_search or not index:
+            job.cancel()
+            return
+        search = job.query[0]
+        if not job.done:
+            percent = job.pos * 100 // max(index.size, 1)
+            self.status.set(f"Searching for: {search} ({percent}%)")
+        elif not job.span:
+            self.status.set(f"Not found: {search}")
+            return
+        elif job.span[0] >= index.indexed_bytes and not index.complete:
+            # line_of only covers the indexed part; poll again as it grows
+            self.status.set(f"Found {search}; waiting for the line index to reach it")
+        else:
+            self.show_large_file_match(job)
+            return
+        self.root.after(self.SEARCH_POLL_MS, self.poll_large_file_search, job)
+
+    def show_large_file_match(self, job):
+        """Page to a match in the mapped file and select it"""
+        index = self.large_file
+        start, end = job.span
+        line = index.line_of(start)
+        line_start = index.line_start(line)
+        col = tk_length(index.decode(index.mm[line_start:start]))
+        length = tk_length(index.decode(index.mm[start:end]))
+        self.page_to(line)
+        first = f"{line - self.window_first + 1}.{col}"
+        self.text.tag_remove('found', '1.0', tk.END)
+        self.text.tag_add('found', first, f"{first}+{length}c")
+        self.text.tag_config('found', background='yellow')
+        self.text.mark_set(tk.INSERT, first)
+        self.status.set(f"Found: {job.query[0]} at line {line:,}")
+
+    def ask_goto_line(self):
+        """Ask for a line number and jump to it"""
+        line = simpledialog.askinteger("Go to Line", "Line number:", parent=self.root, minvalue=1)
+        if line:
+            self.goto_line(line)
+
+    def goto_line(self, line):
+        """Move the cursor to the start of a line and show it"""
+        if self.large_file:
+            self.page_to(line)
+            line = line - self.window_first + 1
+        self.text.mark_set(tk.INSERT, f"{line}.0")
+        self.text.see(tk.INSERT)
+        self.text.focus_set()
 
-    # File operations
-    def new_file(self):
-        """Create a new file"""
-        if self.text.edit_modified():
-            if not messagebox.askyesno("Unsaved Changes", "Discard changes?"):
-                return
-        
-        self.text.delete(1.0, tk.END)
-        self.current_file = None
-        self.root.title("PyEdit - Untitled")
-        self.status.set("New file created")
-        self.text.edit_modified(False)
+    # Symbol index
+    def indexes_symbols(self):
+        """Return True if the active tab is Python source worth an outline"""
+        return not self.large_file and (
+            not self.current_file or self.current_file.endswith(('.py', '.pyw', '.pyi')))
 
-    def open_file(self):
-        """Open an existing file"""
-        if self.text.edit_modified():
-            if not messagebox.askyesno("Unsaved Changes", "Discard changes?"):
-                return
-        
-        file_path = filedialog.askopenfilename(
-            filetypes=[("Text Files", "*.txt"), ("Python Files", "*.py"), ("All Files", "*.*")]
-        )
-        
-        if file_path:
+    def schedule_symbols(self):
+        """Bring the symbol index up to date once typing pauses"""
+        if self.symbol_job:
+            self.root.after_cancel(self.symbol_job)
+        self.symbol_job = self.root.after(self.SYMBOL_DELAY_MS, self.start_symbols)
+
+    def start_symbols(self):
+        """Queue a snapshot of the active tab for the symbol worker"""
+        if self.symbol_job:
+            self.root.after_cancel(self.symbol_job)
+            self.symbol_job = None
+        if not self.indexes_symbols():
+            return
+        self.symbol_jobs.put((self.buffer, self.document.snapshot()))
+        self.symbols_pending += 1
+        if self.symbols_pending == 1:
+            self.root.after(self.SYMBOL_POLL_MS, self.poll_symbols)
+
+    def symbol_worker(self):
+        """Index the snapshots queued by start_symbols (worker thread)"""
+        while True:
+            buffer, snapshot = self.symbol_jobs.get()
             try:
-                with open(file_path, 'r') as file:
-                    self.text.delete(1.0, tk.END)
-                    self.text.insert(1.0, file.read())
-                    self.current_file = file_path
-                    self.root.title(f"PyEdit - {os.path.basename(file_path)}")
-                    self.status.set(f"Opened: {file_path}")
-                    self.text.edit_modified(False)
-                    
-                    if self.syntax_highlighting:
-                        self.highlight_syntax()
+                symbols = buffer.symbol_index.update(snapshot.text())
             except Exception as e:
-                messagebox.showerror("Error", f"Failed to open file:\n{e}")
+                self.report_error("indexing symbols", e)
+                symbols = None
+            self.symbol_results.put((buffer, symbols))
 
-    def save_file(self):
-        """Save the current file"""
-        if self.current_file:
+    @timed
+    def poll_symbols(self):
+        """Store finished indexes on their tabs and refresh what shows them"""
+        changed = False
+        while True:
             try:
-                with open(self.current_file, 'w') as file:
-                    file.write(self.text.get(1.0, tk.END))
-                self.status.set(f"Saved: {self.current_file}")
-                self.text.edit_modified(False)
-            except Exception as e:
-                messagebox.showerror("Error", f"Failed to save file:\n{e}")
-        else:
-            self.save_as()
+                buffer, symbols = self.symbol_results.get_nowait()
+            except queue.Empty:
+                break
+            self.symbols_pending -= 1
+            if symbols is not None:
+                buffer.symbols = symbols
+                changed = changed or buffer is self.buffer
+        
+        if changed:
+            self.refresh_outline()
+            self.refresh_palette()
+        if self.symbols_pending:
+            self.root.after(self.SYMBOL_POLL_MS, self.poll_symbols)
 
-    def save_as(self):
-        """Save file with new name"""
-        file_path = filedialog.asksaveasfilename(
-            defaultextension=".txt",
-            filetypes=[("Text Files", "*.txt"), ("Python Files", "*.py"), ("All Files", "*.*")]
-        )
+    @staticmethod
+    def symbol_label(kind, name):
+        """Return how a symbol is listed"""
+        return f"{name} =" if kind == 'variable' else f"{kind} {name}"
+
+    def toggle_outline(self):
+        """Show or hide the outline side panel"""
+        if self.outline_frame and self.outline_frame.winfo_ismapped():
+            self.outline_frame.pack_forget()
+            self.outline_var.set(False)
+            return
+        self.build_outline_panel()
+        self.outline_frame.pack(side=tk.RIGHT, fill=tk.Y, before=self.text_frame)
+        self.outline_var.set(True)
+        self.outline_symbols = None
+        if self.buffer.symbols is None:
+            self.start_symbols()
+        self.refresh_outline()
+
+    def refresh_outline(self):
+        """List the active tab's symbols in the outline panel, if it is shown"""
+        if not self.outline_frame or not self.outline_frame.winfo_ismapped():
+            return
+        symbols = self.buffer.symbols or []
+        if symbols is self.outline_symbols:
+            return
+        self.outline_symbols = symbols
+        self.outline_list.delete(0, tk.END)
+        if symbols:
+            self.outline_list.insert(tk.END, *(
+                "  " * depth + self.symbol_label(kind, name.rsplit('.', 1)[-1])
+                for line, col, kind, name, depth in symbols))
+
+    def open_outline_item(self, event=None):
+        """Go to the symbol selected in the outline"""
+        selection = self.outline_list.curselection()
+        if selection and self.outline_symbols:
+            line, col = self.outline_symbols[selection[0]][:2]
+            self.show_hit(line, col)
+
+    def show_symbol_palette(self):
+        """Open the go-to-symbol palette; ':' and a number goes to a line instead"""
+        if self.palette:
+            self.palette.lift()
+            self.palette_entry.focus_set()
+            return
+        self.palette = tk.Toplevel(self.root)
+        self.palette.title("Go to Symbol")
+        self.palette.transient(self.root)
+        self.palette.protocol("WM_DELETE_WINDOW", self.close_symbol_palette)
+        self.palette_entry = tk.Entry(self.palette)
+        self.palette_entry.pack(fill=tk.X, padx=5, pady=5)
+        self.palette_list = tk.Listbox(self.palette, width=60, height=15, activestyle=tk.NONE)
+        self.palette_list.pack(fill=tk.BOTH, expand=True)
         
-        if file_path:
+        self.palette_entry.bind("<KeyRelease>", self.on_palette_key)
+        self.palette_entry.bind("<Return>", self.choose_palette_item)
+        self.palette_entry.bind("<Down>", lambda e: self.move_palette_selection(1))
+        self.palette_entry.bind("<Up>", lambda e: self.move_palette_selection(-1))
+        self.palette.bind("<Escape>", lambda e: self.close_symbol_palette())
+        self.palette_list.bind("<Double-Button-1>", self.choose_palette_item)
+        self.palette_entry.focus_set()
+        if self.buffer.symbols is None:
+            self.start_symbols()
+        self.refresh_palette()
+
+    def close_symbol_palette(self):
+        """Close the go-to-symbol palette"""
+        if self.palette:
+            self.palette.destroy()
+            self.palette = None
+            self.text.focus_set()
+
+    def on_palette_key(self, event):
+        """Filter the palette as the query changes"""
+        if event.keysym not in ('Up', 'Down', 'Return', 'Escape'):
+            self.refresh_palette()
+
+    def refresh_palette(self):
+        """Rank the active tab's symbols against the palette query"""
+        if not self.palette:
+            return
+        query = self.palette_entry.get().strip()
+        self.palette_list.delete(0, tk.END)
+        self.palette_matches = []
+        if query.startswith(':'):
+            self.palette_list.insert(tk.END, f"Go to line {query[1:]}")
+            return
+        symbols = self.buffer.symbols
+        if symbols is None:
+            self.palette_list.insert(tk.END, "Indexing..." if self.indexes_symbols()
+                                     else "No symbols; type : and a line number")
+            return
+        
+        if query:
+            scored = []
+            for symbol in symbols:
+                score = fuzzy_score(query, symbol[3])
+                if score is not None:
+                    scored.append((-score, symbol))
+            scored.sort(key=lambda item: item[0])
+            matches = [symbol for _, symbol in scored[:self.MAX_PALETTE_ITEMS]]
+        else:
+            matches = symbols[:self.MAX_PALETTE_ITEMS]
+        self.palette_matches = matches
+        if matches:
+            self.palette_list.insert(tk.END, *(
+                f"{self.symbol_label(kind, name)}    line {line}"
+                for line, col, kind, name, depth in matches))
+            self.palette_list.selection_set(0)
+
+    def move_palette_selection(self, step):
+        """Move the palette selection up or down"""
+        if not self.palette_matches:
+            return "break"
+        selection = self.palette_list.curselection()
+        index = (selection[0] + step if selection else 0) % len(self.palette_matches)
+        self.palette_list.selection_clear(0, tk.END)
+        self.palette_list.selection_set(index)
+        self.palette_list.see(index)
+        return "break"
+
+    def choose_palette_item(self, event=None):
+        """Go to the selected symbol, or to the line typed after ':'"""
+        query = self.palette_entry.get().strip()
+        if query.startswith(':'):
             try:
-                with open(file_path, 'w') as file:
-                    file.write(self.text.get(1.0, tk.END))
-                self.current_file = file_path
-                self.root.title(f"PyEdit - {os.path.basename(file_path)}")
-                self.status.set(f"Saved as: {file_path}")
-                self.text.edit_modified(False)
-            except Exception as e:
-                messagebox.showerror("Error", f"Failed to save file:\n{e}")
+                line = int(query[1:])
+            except ValueError:
+                self.status.set(f"Not a line number: {query[1:]}")
+                return
+            self.close_symbol_palette()
+            self.goto_line(max(line, 1))
+            return
+        selection = self.palette_list.curselection()
+        if not self.palette_matches:
+            return
+        line, col = self.palette_matches[selection[0] if selection else 0][:2]
+        self.close_symbol_palette()
+        self.show_hit(line, col)
 
     # Edit operations
     def cut_text(self):
@@ -298,78 +3843,345 @@ class TextEditor:
     # Find/replace functionality
     def show_find_panel(self):
         """Show the find panel"""
+        self.build_find_panel()
         self.find_frame.pack(fill=tk.X, padx=5, pady=5)
         self.find_entry.focus_set()
 
     def show_replace_panel(self):
         """Show the replace panel"""
+        self.build_find_panel()
         self.find_frame.pack(fill=tk.X, padx=5, pady=5)
         self.replace_entry.focus_set()
 
+    @timed
     def find_text(self):
-        """Find text in document"""
-        self.text.tag_remove('found', '1.0', tk.END)
+        """Find the next match after the cursor"""
         search = self.find_entry.get()
         
-        if search:
-            idx = '1.0'
-            while True:
-                idx = self.text.search(search, idx, nocase=not self.case_sensitive.get(),
-                                     stopindex=tk.END)
-                if not idx:
-                    break
-                
-                last_idx = f"{idx}+{len(search)}c"
-                self.text.tag_add('found', idx, last_idx)
-                idx = last_idx
-            
-            self.text.tag_config('found', background='yellow')
-            self.status.set(f"Found: {search}")
+        if search and self.large_file:
+            self.text.tag_remove('found', '1.0', tk.END)
+            self.find_in_large_file(search)
+        elif search:
+            if self.search_current():
+                self.goto_match(1)
+            else:
+                self.start_search(jump=True)
+
+    @timed
+    def find_in_files(self):
+        """Search every file under a chosen directory for the find query"""
+        query = self.search_options()
+        search = query[0] or simpledialog.askstring("Find in Files", "Search for:", parent=self.root)
+        if not search:
+            return
+        query = (search,) + query[1:]
+        try:
+            compile_search(*query)
+        except re.error as e:
+            self.status.set(f"Invalid pattern: {e}")
+            return
+        
+        directory = filedialog.askdirectory(title="Find in Files")
+        if not directory:
+            return
+        
+        self.cancel_file_search()
+        self.build_results_panel()
+        self.file_hits = []
+        self.results_list.delete(0, tk.END)
+        self.results_frame.pack(fill=tk.BOTH, padx=5, pady=5, before=self.statusbar)
+        self.file_search = FileSearch(directory, query).start()
+        self.poll_file_search()
+
+    @timed
+    def poll_file_search(self):
+        """List the hits that arrived since the last poll"""
+        job = self.file_search
+        if not job:
+            return
+        
+        finished = False
+        lines = []
+        while True:
+            try:
+                hits = job.results.get_nowait()
+            except queue.Empty:
+                break
+            if hits is None:
+                finished = True
+                break
+            for path, line, col, preview in hits:
+                self.file_hits.append((path, line, col))
+                lines.append(f"{os.path.relpath(path, job.root)}:{line}: {preview}")
+        if lines:
+            self.results_list.insert(tk.END, *lines)
+        
+        count = len(self.file_hits)
+        if count >= self.MAX_FILE_HITS and not finished:
+            job.cancel()
+        if finished:
+            self.file_search = None
+            if job.error:
+                self.results_label.config(text=f"Search failed: {job.error}")
+            else:
+                state = "stopped" if job.cancelled.is_set() else "done"
+                self.results_label.config(text=f"{count} hits in {job.files} files ({state})")
+            return
+        self.results_label.config(text=f"Searching... {count} hits in {job.files} files")
+        self.root.after(self.SEARCH_POLL_MS, self.poll_file_search)
+
+    def cancel_file_search(self):
+        """Stop the running Find in Files search"""
+        if self.file_search:
+            self.file_search.cancel()
+
+    def hide_results_panel(self):
+        """Stop searching and hide the Find in Files results"""
+        self.cancel_file_search()
+        if self.results_frame:
+            self.results_frame.pack_forget()
+
+    def open_file_hit(self, event=None):
+        """Open the selected Find in Files hit at its line"""
+        selection = self.results_list.curselection()
+        if not selection:
+            return
+        path, line, col = self.file_hits[selection[0]]
+        self.open_in_tab(path, on_loaded=lambda: self.show_hit(line, col))
+        if self.large_file:
+            self.goto_line(line)
+
+    def show_hit(self, line, col):
+        """Move the cursor to a line and column and show it"""
+        self.goto_line(line)
+        if not self.large_file:
+            col = tk_column(self.document.get_lines(line, line)[0], col)
+            self.text.mark_set(tk.INSERT, f"{line}.{col}")
+            self.text.see(tk.INSERT)
+
+    def find_previous(self):
+        """Find the previous match before the cursor"""
+        if self.search_current():
+            self.goto_match(-1)
+        return "break"
+
+    def search_options(self):
+        """Return the find panel's query and options"""
+        self.build_find_panel()
+        return (self.find_entry.get(), self.regex_search.get(),
+                self.case_sensitive.get(), self.whole_word.get())
+
+    def search_current(self):
+        """Return True if the search results match the query and buffer"""
+        job = self.search_job
+        return bool(job and job.lines_ready and not self.search_stale
+                    and job.query == self.search_options())
+
+    def on_find_entry_key(self, event):
+        """Re-run the search shortly after the query changes"""
+        if event.keysym not in ('Return', 'Shift_L', 'Shift_R'):
+            self.schedule_search(self.SEARCH_DELAY_MS)
+
+    def schedule_search(self, delay):
+        """Restart the search after delay ms unless rescheduled meanwhile"""
+        if self.search_delay_job:
+            self.root.after_cancel(self.search_delay_job)
+        self.search_delay_job = self.root.after(delay, self.start_search)
 
+    def cancel_search(self):
+        """Stop the running search and clear its matches"""
+        if self.search_delay_job:
+            self.root.after_cancel(self.search_delay_job)
+            self.search_delay_job = None
+        if self.search_poll_job:
+            self.root.after_cancel(self.search_poll_job)
+            self.search_poll_job = None
+        if self.search_job:
+            self.search_job.cancel()
+            self.search_job = None
+        self.text.tag_remove('found', '1.0', tk.END)
+        self.current_match = -1
+        self.search_stale = False
+
+    @timed
+    def start_search(self, jump=False):
+        """Cancel the running search and scan a fresh snapshot for the query"""
+        self.cancel_search()
+        if self.large_file:
+            return
+        
+        query = self.search_options()
+        search, regex, case_sensitive, whole_word = query
+        if not search:
+            self.status.set("Ready")
+            return
+        try:
+            pattern = compile_search(search, regex, case_sensitive, whole_word)
+        except re.error as e:
+            self.status.set(f"Invalid pattern: {e}")
+            return
+        
+        self.search_job = BufferSearch(query, pattern, self.document.text()).start()
+        self.search_jump = jump
+        self.poll_search()
+
+    @timed
+    def poll_search(self):
+        """Show progress of the running search and tag the matches in view"""
+        self.search_poll_job = None
+        job = self.search_job
+        if not job or not job.lines_ready:
+            if job:
+                self.search_poll_job = self.root.after(self.SEARCH_POLL_MS, self.poll_search)
+            return
+        
+        self.tag_visible_matches()
+        if self.search_jump and (job.done or (job.starts and job.starts[-1] >= self.cursor_offset(job))):
+            self.search_jump = False
+            self.goto_match(1)
+        
+        count = len(job.starts)
+        if job.done and not count:
+            self.status.set(f"Not found: {job.query[0]}")
+        elif self.current_match >= 0:
+            total = f"{count}" if job.done else f"{count}+"
+            self.status.set(f"Match {self.current_match + 1} of {total}")
+        elif job.done:
+            self.status.set(f"{count} matches")
+        else:
+            self.status.set(f"Searching... {count} matches so far")
+        if not job.done:
+            self.search_poll_job = self.root.after(self.SEARCH_POLL_MS, self.poll_search)
+
+    def cursor_offset(self, job):
+        """Return the cursor position as an offset into the search snapshot"""
+        line, col = map(int, self.text.index(tk.INSERT).split('.'))
+        return job.offset(min(line, len(job.line_starts)), col)
+
+    @timed
+    def goto_match(self, direction):
+        """Select the next (1) or previous (-1) match relative to the cursor"""
+        job = self.search_job
+        count = len(job.starts)
+        if not count:
+            self.status.set(f"Not found: {job.query[0]}")
+            return
+        
+        cursor = self.cursor_offset(job)
+        if direction > 0:
+            if 0 <= self.current_match < count and job.starts[self.current_match] == cursor:
+                match = self.current_match + 1
+            else:
+                match = bisect.bisect_left(job.starts, cursor)
+        else:
+            match = bisect.bisect_left(job.starts, cursor) - 1
+            if 0 <= self.current_match < count and job.ends[self.current_match] == cursor:
+                match = self.current_match - 1
+        match %= count
+        self.current_match = match
+        
+        start, end = job.index(job.starts[match]), job.index(job.ends[match])
+        self.text.tag_remove(tk.SEL, '1.0', tk.END)
+        self.text.tag_add(tk.SEL, start, end)
+        self.text.mark_set(tk.INSERT, end if direction > 0 else start)
+        self.text.see(start)
+        total = f"{count}" if job.done else f"{count}+"
+        self.status.set(f"Match {match + 1} of {total}")
+
+    @timed
+    def tag_visible_matches(self):
+        """Tag only the matches inside the viewport"""
+        job = self.search_job
+        if not job or not job.lines_ready or self.search_stale:
+            return
+        first, last = self.visible_lines(self.highlight_margin)
+        line_count = len(job.line_starts)
+        start = job.line_starts[min(first, line_count) - 1]
+        end = job.line_starts[last] if last < line_count else len(job.text)
+        i = bisect.bisect_left(job.starts, start)
+        j = min(bisect.bisect_left(job.starts, end), i + self.MAX_VISIBLE_MATCHES)
+        
+        indices = []
+        for k in range(i, j):
+            indices.append(job.index(job.starts[k]))
+            indices.append(job.index(job.ends[k]))
+        self.text.tag_remove('found', '1.0', tk.END)
+        if indices:
+            self.text.tag_add('found', *indices)
+
+    def search_pattern(self):
+        """Compile the find panel's query, reporting an invalid pattern"""
+        search, regex, case_sensitive, whole_word = self.search_options()
+        try:
+            return compile_search(search, regex, case_sensitive, whole_word)
+        except re.error as e:
+            self.status.set(f"Invalid pattern: {e}")
+
+    @timed
     def replace_text(self):
         """Replace next occurrence of found text"""
         search = self.find_entry.get()
         replace = self.replace_entry.get()
         
-        if search and replace:
+        if self.large_file:
+            self.status.set("Large file mode is read-only")
+        elif search:
+            pattern = self.search_pattern()
+            if not pattern:
+                return
             if self.text.tag_ranges(tk.SEL):
                 idx = self.text.index(tk.SEL_FIRST)
             else:
                 idx = '1.0'
             
-            idx = self.text.search(search, idx, nocase=not self.case_sensitive.get(),
-                                 stopindex=tk.END)
-            
-            if idx:
-                last_idx = f"{idx}+{len(search)}c"
-                self.text.delete(idx, last_idx)
-                self.text.insert(idx, replace)
-                self.status.set(f"Replaced: {search} with {replace}")
+            start = self.document.index_offset(*map(int, idx.split('.')))
+            match = pattern.search(self.document.text(), start)
+            if match and match.end() > match.start():
+                try:
+                    replacement = match.expand(replace_template(replace, self.regex_search.get()))
+                except (re.error, IndexError) as e:
+                    self.status.set(f"Invalid replacement: {e}")
+                    return
+                first = self.document.index(match.start())
+                last = self.document.index(match.end())
+                self.text.replace(first, last, replacement)
+                self.text.mark_set(tk.INSERT, f"{first}+{tk_length(replacement)}c")
+                self.status.set(f"Replaced: {match.group()} with {replacement}")
                 self.find_text()
 
+    @timed
     def replace_all(self):
-        """Replace all occurrences of text"""
+        """Replace all occurrences in one pass and apply them as one undo step"""
         search = self.find_entry.get()
         replace = self.replace_entry.get()
         
-        if search and replace:
-            self.text.tag_remove('found', '1.0', tk.END)
-            count = 0
-            idx = '1.0'
+        if self.large_file:
+            self.status.set("Large file mode is read-only")
+        elif search:
+            pattern = self.search_pattern()
+            if not pattern:
+                return
+            started = time.perf_counter()
+            try:
+                regions, count = replace_regions(pattern, replace, self.document.text(),
+                                                 self.regex_search.get())
+            except (re.error, IndexError) as e:
+                self.status.set(f"Invalid replacement: {e}")
+                return
             
-            while True:
-                idx = self.text.search(search, idx, nocase=not self.case_sensitive.get(),
-                                     stopindex=tk.END)
-                if not idx:
-                    break
-                
-                last_idx = f"{idx}+{len(search)}c"
-                self.text.delete(idx, last_idx)
-                self.text.insert(idx, replace)
-                count += 1
-                idx = f"{idx}+{len(replace)}c"
+            # Splice each changed region back to front, so the offsets of the
+            # ones before stay valid and text between them keeps its tags
+            if regions:
+                self.text.tag_remove('found', '1.0', tk.END)
+                self.history.begin()
+                try:
+                    for start, end, new in reversed(regions):
+                        self.text.replace(self.document.index(start), self.document.index(end), new)
+                finally:
+                    self.history.end()
             
-            self.status.set(f"Replaced {count} occurrences")
+            elapsed = time.perf_counter() - started
+            self.status.set(f"Replaced {count} occurrences in {elapsed:.2f}s")
 
     # View/Format operations
     def toggle_dark_mode(self):
@@ -382,12 +4194,17 @@ class TextEditor:
         """Toggle syntax highlighting"""
         self.syntax_highlighting = not self.syntax_highlighting
         if self.syntax_highlighting:
-            self.text.bind("<KeyRelease>", self.highlight_syntax)
+            # Hidden tabs start over when they are next shown
+            for buffer in self.buffers:
+                buffer.highlighter.reset(buffer.document.line_count())
             self.highlight_syntax()
             self.status.set("Syntax highlighting on")
         else:
-            self.text.unbind("<KeyRelease>")
-            self.clear_syntax()
+            self.highlight_generation += 1
+            self.pending_spans.clear()
+            for buffer in self.buffers:
+                if buffer.text:
+                    self.clear_syntax(buffer.text)
             self.status.set("Syntax highlighting off")
 
     def toggle_auto_save(self):
@@ -401,53 +4218,342 @@ class TextEditor:
 
     def change_font(self):
         """Change the editor font"""
-        family = self.font_family.get()
-        size = self.font_size.get()
-        self.text.config(font=(family, size))
+        self.text_font = (self.font_family.get(), self.font_size.get())
+        for buffer in self.buffers:
+            if buffer.text:
+                buffer.text.config(font=self.text_font)
+
+    # Long-line mode
+    def toggle_long_lines(self):
+        """Turn long-line mode on or off for the active tab"""
+        if self.large_file:
+            self.long_lines_var.set(False)
+            self.status.set("Long-line mode is not available in large file mode")
+            return
+        self.set_long_lines(not self.long_lines)
+        self.status.set(f"Long-line mode {'on' if self.long_lines else 'off'}")
+
+    def set_long_lines(self, enabled):
+        """Stop wrapping and cap highlighting at long_line_columns, or undo that"""
+        self.long_lines = enabled
+        self.long_lines_var.set(enabled)
+        text = self.text
+        self.configure_long_lines(text)
+        
+        # Tags laid down without the cap would be left behind, so start over
+        self.highlighter.max_columns = self.long_line_columns if enabled else None
+        self.highlighter.use_table(None, None)
+        self.highlight_generation += 1
+        self.pending_spans.clear()
+        self.clear_syntax(text)
+        self.highlighter.reset(self.line_count())
+        self.schedule_highlight()
+        self.schedule_status()
+
+    def configure_long_lines(self, text):
+        """Set a widget's wrapping and horizontal scrollbar for the active tab's mode"""
+        enabled = self.long_lines
+        text.config(wrap=tk.NONE if enabled else tk.WORD)
+        if enabled and not text.hbar:
+            text.hbar = tk.Scrollbar(text.frame, orient=tk.HORIZONTAL, command=text.xview)
+            text.config(xscrollcommand=text.hbar.set)
+        if text.hbar:
+            if enabled:
+                text.hbar.pack(side=tk.BOTTOM, fill=tk.X, before=text.vbar)
+            else:
+                text.hbar.pack_forget()
+
+    def show_split_view(self):
+        """Show the active tab with its lines cut into rows of split_width, read-only"""
+        if self.large_file:
+            self.status.set("The split view is not available in large file mode")
+            return
+        if self.split_view:
+            self.split_view.destroy()
+        window = self.split_view = tk.Toplevel(self.root)
+        window.title(f"Split view - {self.buffer.name()}")
+        window.protocol("WM_DELETE_WINDOW", self.close_split_view)
+        text = scrolledtext.ScrolledText(window, wrap=tk.NONE, font=self.text_font)
+        text.pack(fill=tk.BOTH, expand=True)
+        self.theme_text(text)
+        text.config(state=tk.DISABLED)
+        tk.Label(window, anchor=tk.W,
+                 text="Snapshot of the buffer; double-click a row to go there").pack(fill=tk.X)
+        
+        # row_starts maps each row to the document offset it begins at
+        job = {'text': text, 'source': self.document.text(), 'pos': 0,
+               'row_starts': array('Q'), 'buffer': self.buffer, 'window': window}
+        text.bind("<Double-Button-1>", lambda e: self.goto_split_row(job, e))
+        self.split_view_step(job)
+
+    @timed
+    def split_view_step(self, job):
+        """Add the next slice of rows to the split view"""
+        if job['window'] is not self.split_view:
+            return
+        source, pos, width = job['source'], job['pos'], self.split_width
+        deadline = time.perf_counter() + self.load_slice_ms / 1000
+        rows = []
+        while pos < len(source) and time.perf_counter() < deadline:
+            for _ in range(1024):
+                line_end = source.find('\n', pos)
+                if line_end < 0:
+                    line_end = len(source)
+                row_end = min(line_end, pos + width)
+                rows.append(source[pos:row_end])
+                job['row_starts'].append(pos)
+                pos = row_end + 1 if row_end == line_end else row_end
+                if pos >= len(source):
+                    break
+        
+        text = job['text']
+        text.config(state=tk.NORMAL)
+        text.insert(tk.END, ('\n' if job['pos'] else '') + '\n'.join(rows))
+        text.config(state=tk.DISABLED)
+        job['pos'] = pos
+        if pos < len(source):
+            self.root.after(1, self.split_view_step, job)
+
+    def goto_split_row(self, job, event):
+        """Move the main cursor to the place a split view row came from"""
+        row, col = map(int, job['text'].index(f"@{event.x},{event.y}").split('.'))
+        if job['buffer'] is not self.buffer or row > len(job['row_starts']):
+            return
+        start = job['row_starts'][row - 1]
+        offset = min(start + text_column(self.document.get(start, start + col), col), len(self.document))
+        self.text.mark_set(tk.INSERT, self.document.index(offset))
+        self.text.see(tk.INSERT)
+        self.schedule_status()
+
+    def close_split_view(self):
+        """Close the split long lines view"""
+        if self.split_view:
+            self.split_view.destroy()
+            self.split_view = None
 
     # Syntax highlighting
+    def schedule_highlight(self):
+        """Run a highlight pass once the pending events have been handled"""
+        if (self.syntax_highlighting and not self.highlight_job
+                and not self.file_loader and not self.large_file):
+            self.highlight_job = self.root.after_idle(self.highlight_syntax)
+
+    @timed
     def highlight_syntax(self, event=None):
-        """Apply syntax highlighting"""
+        """Start a highlight pass over the lines that need it"""
+        self.highlight_job = None
         if not self.syntax_highlighting:
             return
+        if self.highlight_busy:
+            self.highlight_rerun = True
+            return
+        
+        line_count = self.line_count()
+        if self.highlight_visible_only:
+            first, last = self.visible_lines(self.highlight_margin)
+            last = min(last, line_count)
+        else:
+            first, last = 1, line_count
+        start = self.highlighter.first_pending(first, last)
+        if not start:
+            return
+        
+        # Small passes are cheaper done here on the live line states; only
+        # the worker gets its own copy of them and a snapshot of the document
+        if last - start < self.highlight_inline_lines:
+            self.apply_spans(list(self.highlighter.rehighlight(self.get_lines, first, last)))
+            return
         
-        self.clear_syntax()
+        self.highlight_busy = True
+        job = self.highlighter.copy()
+        self.highlight_jobs.put((self.highlight_generation, job, self.document.snapshot(), first, last))
+        self.root.after(self.HIGHLIGHT_POLL_MS, self.poll_highlight_results)
+
+    def highlight_worker(self):
+        """Tokenize the snapshots queued by highlight_syntax (worker thread)"""
+        while True:
+            generation, job, snapshot, first, last = self.highlight_jobs.get()
+            results = None
+            if generation == self.highlight_generation:
+                try:
+                    results = list(job.rehighlight(snapshot.get_lines, first, last))
+                except Exception as e:
+                    self.report_error("highlighting", e)
+            self.highlight_results.put((generation, job, results))
+
+    @timed
+    def poll_highlight_results(self):
+        """Pick up a finished pass from the worker and start tagging it"""
+        try:
+            generation, job, results = self.highlight_results.get_nowait()
+        except queue.Empty:
+            self.root.after(self.HIGHLIGHT_POLL_MS, self.poll_highlight_results)
+            return
         
-        # Highlight Python keywords
-        for word in self.python_keywords:
-            self.highlight_pattern(r'\b' + word + r'\b', 'keyword')
+        if results is None or generation != self.highlight_generation:
+            # The buffer changed while the worker ran, so redo the pass
+            self.highlight_busy = False
+            self.highlight_rerun = False
+            self.schedule_highlight()
+            return
         
-        # Highlight builtins
-        for word in self.python_builtins:
-            self.highlight_pattern(r'\b' + word + r'\b', 'builtin')
+        # Lines count as tagged only once their slice has been applied
+        for line, spans in results:
+            job.tagged[line - 1] = 0
+        self.highlighter = job
+        self.pending_spans.extend(results)
+        self.apply_pending_spans()
+
+    @timed
+    def apply_pending_spans(self):
+        """Apply queued highlight results in slices that fit in one frame"""
+        deadline = time.perf_counter() + self.highlight_slice_ms / 1000
+        while self.pending_spans and time.perf_counter() < deadline:
+            count = min(self.SLICE_LINES, len(self.pending_spans))
+            batch = [self.pending_spans.popleft() for _ in range(count)]
+            self.apply_spans(batch)
+            for line, spans in batch:
+                self.highlighter.tagged[line - 1] = 1
         
-        # Highlight strings and comments
-        self.highlight_pattern(r'"[^"\\]*(\\.[^"\\]*)*"', 'string')
-        self.highlight_pattern(r"'[^'\\]*(\\.[^'\\]*)*'", 'string')
-        self.highlight_pattern(r'#[^\n]*', 'comment')
-        self.highlight_pattern(r'\b[0-9]+\b', 'number')
+        if self.pending_spans:
+            self.root.after(1, self.apply_pending_spans)
+            return
+        self.highlight_busy = False
+        if self.highlight_rerun:
+            self.highlight_rerun = False
+            self.schedule_highlight()
 
-    def highlight_pattern(self, pattern, tag):
-        """Helper function to highlight text patterns"""
-        self.text.tag_remove(tag, '1.0', tk.END)
-        start = '1.0'
+    def apply_spans(self, results):
+        """Replace the syntax tags on re-tokenized lines in batched Tk calls
         
-        while True:
-            start = self.text.search(pattern, start, regexp=True, 
-                                   stopindex=tk.END)
-            if not start:
-                break
-            
-            end = f"{start}+{len(self.text.get(start, f'{start} lineend'))}c"
-            self.text.tag_add(tag, start, end)
-            start = end
+        results is a list of (line, spans) in line order. Tags are cleared
+        once per run of consecutive lines and added with one tag_add call
+        per tag carrying many index pairs.
+        """
+        if not results:
+            return
+        
+        indices = {tag: [] for tag in self.syntax_colors}
+        run_start = prev = results[0][0]
+        for line, spans in results:
+            if line != prev + 1 and line != run_start:
+                self.remove_syntax_tags(run_start, prev)
+                run_start = line
+            prev = line
+            for start, end, tag in spans:
+                indices[tag].append(f"{line}.{start}")
+                indices[tag].append(f"{line}.{end}")
+        self.remove_syntax_tags(run_start, prev)
+        
+        for tag, tag_indices in indices.items():
+            for i in range(0, len(tag_indices), self.TAG_BATCH):
+                self.text.tag_add(tag, *tag_indices[i:i + self.TAG_BATCH])
+
+    def remove_syntax_tags(self, first, last):
+        """Remove the syntax tags from an inclusive line range"""
+        # Nothing past the column cap is ever tagged, so spare Tk the long line ends
+        end = f"{last}.{self.highlighter.max_columns}" if self.long_lines else f"{last}.0 lineend"
+        for tag in self.syntax_colors:
+            self.text.tag_remove(tag, f"{first}.0", end)
+
+    def visible_lines(self, margin=0):
+        """Return the first and last line in the viewport, widened by margin"""
+        first = int(self.text.index('@0,0').split('.')[0])
+        last = int(self.text.index(f'@0,{self.text.winfo_height()}').split('.')[0])
+        return max(1, first - margin), last + margin
+
+    def get_lines(self, first, last):
+        """Return the text of an inclusive line range as a list of lines"""
+        return self.document.get_lines(first, last)
 
-    def clear_syntax(self):
+    def line_count(self):
+        """Return the number of lines in the document"""
+        return self.document.line_count()
+
+    def clear_syntax(self, text):
         """Clear all syntax highlighting"""
         for tag in ['keyword', 'string', 'comment', 'number', 'builtin']:
-            self.text.tag_remove(tag, '1.0', tk.END)
+            text.tag_remove(tag, '1.0', tk.END)
+
+    # Instrumentation
+    def toggle_overlay(self):
+        """Show or hide the live performance overlay, recording while shown"""
+        if self.overlay:
+            self.overlay.destroy()
+            self.overlay = None
+            PERF.enabled = False
+            self.overlay_var.set(False)
+            return
+        
+        PERF.reset()
+        PERF.enabled = True
+        self.overlay_var.set(True)
+        self.overlay = tk.Toplevel(self.root)
+        self.overlay.title("Performance")
+        self.overlay.attributes('-topmost', True)
+        self.overlay.protocol("WM_DELETE_WINDOW", self.toggle_overlay)
+        buttons = tk.Frame(self.overlay)
+        buttons.pack(fill=tk.X)
+        tk.Button(buttons, text="Reset", command=PERF.reset).pack(side=tk.LEFT)
+        tk.Button(buttons, text="Export JSON", command=self.export_performance).pack(side=tk.LEFT, padx=5)
+        self.overlay_text = tk.Text(self.overlay, width=72, height=24, font=('Consolas', 9))
+        self.overlay_text.pack(fill=tk.BOTH, expand=True)
+        self.refresh_overlay()
+
+    def refresh_overlay(self):
+        """Redraw the overlay's table and schedule the next refresh"""
+        if not self.overlay:
+            return
+        data = PERF.summary()
+        lines = [f"{'handler':26}{'calls':>8}{'p50':>9}{'p95':>9}{'p99':>9}{'max':>9}  (ms)"]
+        for name, row in sorted(data['handlers'].items(), key=lambda item: -item[1]['p95']):
+            lines.append(f"{name:26}{row['calls']:8}{row['p50']:9.2f}{row['p95']:9.2f}"
+                         f"{row['p99']:9.2f}{row['max']:9.2f}")
+        lines.append("")
+        lines.append(f"{'Tcl command':26}{'calls':>8}")
+        for command, count in sorted(data['tcl_calls'].items(), key=lambda item: -item[1]):
+            lines.append(f"{command:26}{count:8}")
+        
+        self.overlay_text.config(state=tk.NORMAL)
+        self.overlay_text.delete('1.0', tk.END)
+        self.overlay_text.insert('1.0', '\n'.join(lines))
+        self.overlay_text.config(state=tk.DISABLED)
+        self.overlay.after(self.OVERLAY_REFRESH_MS, self.refresh_overlay)
+
+    def export_performance(self):
+        """Save the recorded latencies and Tcl counts as JSON"""
+        if not PERF.samples and not PERF.tcl_calls:
+            self.status.set("No performance data; turn on the overlay to record")
+            return
+        path = filedialog.asksaveasfilename(defaultextension=".json",
+                                            filetypes=[("JSON Files", "*.json")])
+        if path:
+            try:
+                PERF.export(path)
+                self.status.set(f"Performance data written to {path}")
+            except OSError as e:
+                messagebox.showerror("Error", f"Failed to export:\n{e}")
+
+    def toggle_profiler(self):
+        """Start a cProfile capture, or stop it and write the stats"""
+        if not self.profiler:
+            self.profiler = cProfile.Profile()
+            self.profiler.enable()
+            self.status.set("Profiling... press Ctrl+Shift+P again to stop")
+            return
+        
+        self.profiler.disable()
+        path = os.path.abspath(f"pyedit-{datetime.now():%Y%m%d-%H%M%S}.prof")
+        stats = pstats.Stats(self.profiler)
+        self.profiler = None
+        try:
+            stats.dump_stats(path)
+            self.status.set(f"Profile written to {path}")
+        except OSError as e:
+            self.status.set(f"Failed to write profile: {e}")
 
     # Theme and appearance
+    @timed
     def apply_theme(self):
         """Apply the current theme colors"""
         theme = self.dark_theme if self.dark_mode else self.light_theme
@@ -455,16 +4561,51 @@ class TextEditor:
         # Configure main widgets
         self.root.config(bg=theme['bg'])
         self.text_frame.config(bg=theme['bg'])
+        self.tab_bar.config(bg=theme['status_bg'])
+        for buffer in self.buffers:
+            if buffer.text:
+                self.theme_text(buffer.text)
+            self.theme_tab(buffer.tab)
+        
+        self.theme_find_panel()
+        
+        # Configure status bar
+        self.statusbar.config(
+            bg=theme['status_bg'],
+            fg=theme['status_fg']
+        )
+        self.metrics_bar.config(
+            bg=theme['status_bg'],
+            fg=theme['status_fg']
+        )
         
-        self.text.config(
+        # Re-apply syntax highlighting with new colors
+        if self.syntax_highlighting:
+            self.schedule_highlight()
+
+    def theme_text(self, text):
+        """Apply the current theme colors to a text widget"""
+        theme = self.dark_theme if self.dark_mode else self.light_theme
+        text.config(
             bg=theme['text_bg'],
             fg=theme['text_fg'],
             insertbackground=theme['fg'],
             selectbackground=theme['select_bg'],
             selectforeground=theme['select_fg']
         )
-        
-        # Configure find/replace panel
+        self.setup_syntax_tags(text)
+
+    def theme_tab(self, tab):
+        """Apply the current theme colors to a tab button"""
+        theme = self.dark_theme if self.dark_mode else self.light_theme
+        tab.config(bg=theme['status_bg'], fg=theme['fg'], selectcolor=theme['text_bg'],
+                   activebackground=theme['select_bg'], activeforeground=theme['fg'])
+
+    def theme_find_panel(self):
+        """Apply the current theme colors to the find/replace panel, if built"""
+        if not self.find_frame:
+            return
+        theme = self.dark_theme if self.dark_mode else self.light_theme
         self.find_frame.config(bg=theme['bg'])
         for widget in self.find_frame.winfo_children():
             if isinstance(widget, (tk.Label, tk.Button, tk.Checkbutton)):
@@ -475,33 +4616,32 @@ class TextEditor:
                     fg=theme['text_fg'],
                     insertbackground=theme['fg']
                 )
-        
-        # Configure status bar
-        self.statusbar.config(
-            bg=theme['status_bg'],
-            fg=theme['status_fg']
-        )
-        
-        # Re-apply syntax highlighting with new colors
-        if self.syntax_highlighting:
-            self.setup_syntax_tags()
-            self.highlight_syntax()
 
-    def setup_syntax_tags(self):
+    def setup_syntax_tags(self, text):
         """Configure tags for syntax highlighting"""
         for tag, color in self.syntax_colors.items():
-            self.text.tag_configure(tag, foreground=color)
+            text.tag_configure(tag, foreground=color)
 
     # Session management
     def save_session(self):
         """Save editor session"""
+        self.capture_view()
         session = {
             'file': self.current_file,
+            'tabs': [{'file': buffer.current_file, 'cursor': buffer.cursor, 'top': buffer.top}
+                     for buffer in self.buffers if buffer.current_file],
+            'buffer_budget': self.buffer_budget,
             'geometry': self.root.geometry(),
             'dark_mode': self.dark_mode,
             'syntax': self.syntax_highlighting,
             'font': self.font_family.get(),
-            'size': self.font_size.get()
+            'size': self.font_size.get(),
+            'undo_budget': self.undo_budget,
+            'follow_max_lines': self.follow_max_lines,
+            'long_line_threshold': self.long_line_threshold,
+            'long_line_columns': self.long_line_columns,
+            'split_width': self.split_width,
+            'follow_scroll': self.follow_scroll_var.get()
         }
         
         try:
@@ -511,34 +4651,153 @@ class TextEditor:
             print(f"Error saving session: {e}")
 
     def load_session(self):
-        """Load editor session"""
+        """Apply the saved settings and return the saved session"""
+        session = {}
         try:
             if os.path.exists(self.session_file):
                 with open(self.session_file) as f:
                     session = json.load(f)
-                
-                if session.get('geometry'):
-                    self.root.geometry(session['geometry'])
-                
-                if session.get('dark_mode'):
-                    self.dark_mode = session['dark_mode']
-                    self.dark_mode_var.set(self.dark_mode)
-                
-                if session.get('syntax'):
-                    self.syntax_highlighting = session['syntax']
-                    self.syntax_var.set(self.syntax_highlighting)
-                
-                if session.get('font'):
-                    self.font_family.set(session['font'])
-                
-                if session.get('size'):
-                    self.font_size.set(session['size'])
-                
-                if session.get('file') and os.path.exists(session['file']):
-                    self.current_file = session['file']
-                    self.open_file()
+            
+            if session.get('geometry'):
+                self.root.geometry(session['geometry'])
+            
+            if session.get('dark_mode'):
+                self.dark_mode = session['dark_mode']
+                self.dark_mode_var.set(self.dark_mode)
+            
+            if session.get('syntax'):
+                self.syntax_highlighting = session['syntax']
+                self.syntax_var.set(self.syntax_highlighting)
+            
+            if session.get('font'):
+                self.font_family.set(session['font'])
+            
+            if session.get('size'):
+                self.font_size.set(session['size'])
+            self.change_font()
+            
+            if session.get('undo_budget'):
+                self.undo_budget = self.history.budget = session['undo_budget']
+            
+            if session.get('buffer_budget'):
+                self.buffer_budget = session['buffer_budget']
+            
+            for key in ('long_line_threshold', 'long_line_columns', 'split_width'):
+                if session.get(key):
+                    setattr(self, key, session[key])
+            
+            if session.get('follow_max_lines'):
+                self.follow_max_lines = session['follow_max_lines']
+            
+            if 'follow_scroll' in session:
+                self.follow_scroll_var.set(session['follow_scroll'])
         except Exception as e:
             print(f"Error loading session: {e}")
+        return session
+
+    def restore_session(self, session):
+        """Recover unsaved edits or reopen the last tabs, once the window is up"""
+        recovered = self.recover_journals()
+        self.session_restored = True
+        self.journal.reset(EditJournal.header(None))
+        self.replay_journals(recovered)
+        self.restore_tabs(session, show=not recovered)
+
+    def restore_tabs(self, session, show):
+        """Add a tab per file of the saved session, reading only the one shown"""
+        tabs = session.get('tabs')
+        if tabs is None:
+            tabs = [{'file': session['file']}] if session.get('file') else []
+        blank = self.buffer
+        shown = None
+        for tab in tabs:
+            path = tab.get('file')
+            if not path or not os.path.exists(path) or self.find_buffer(path):
+                continue
+            buffer = self.add_buffer(path, position=len(self.buffers))
+            buffer.cursor = tab.get('cursor', '1.0')
+            buffer.top = tab.get('top', '1.0')
+            if not shown or path == session.get('file'):
+                shown = buffer
+        
+        if show and shown:
+            keep_blank = self.current_file or self.buffer_modified(blank) or len(self.document)
+            self.activate_buffer(shown)
+            # The empty tab the editor started with is not worth keeping
+            if not keep_blank:
+                self.close_buffer(blank)
+
+    def recover_journals(self):
+        """Offer to replay edits that earlier sessions never saved
+        
+        Returns (file, edits, journal path) for each journal to replay;
+        journals with nothing to recover are deleted.
+        """
+        recovered = []
+        for number, path in self.old_journals:
+            header, deltas = EditJournal.read(path)
+            file_path = header.get('file') if header else None
+            if not deltas:
+                EditJournal.remove(path)
+                continue
+            if file_path:
+                try:
+                    file_stat = os.stat(file_path)
+                except OSError:
+                    file_stat = None
+                if (not file_stat or file_stat.st_size != header.get('size')
+                        or file_stat.st_mtime_ns != header.get('mtime')):
+                    messagebox.showwarning(
+                        "Recover Unsaved Changes",
+                        f"{file_path} changed since the unsaved edits were made; "
+                        "they cannot be recovered."
+                    )
+                    EditJournal.remove(path)
+                    continue
+            recovered.append((file_path, deltas, path))
+        
+        if recovered:
+            names = ', '.join(file_path or "an untitled file" for file_path, _, _ in recovered)
+            count = sum(len(deltas) for _, deltas, _ in recovered)
+            if not messagebox.askyesno("Recover Unsaved Changes",
+                                       f"Recover {count} unsaved edits to {names}?"):
+                for _, _, path in recovered:
+                    EditJournal.remove(path)
+                recovered = []
+        self.old_journals = []
+        return recovered
+
+    def replay_journals(self, recovered):
+        """Replay recovered journals into tabs, one after the other"""
+        if not recovered:
+            return
+        file_path, deltas, path = recovered[0]
+        
+        def replay():
+            # The tab's own journal records the replayed edits before the old one goes
+            self.replay_journal(deltas)
+            EditJournal.remove(path)
+            self.replay_journals(recovered[1:])
+        
+        if file_path:
+            # The next journal waits for this file to load, as switching tabs would stop it
+            self.open_in_tab(file_path, on_loaded=replay)
+            if self.large_file:
+                self.replay_journals(recovered[1:])
+        else:
+            if not self.active_blank():
+                self.activate_buffer(self.add_buffer())
+            replay()
+
+    def replay_journal(self, deltas):
+        """Re-apply journaled edits to the buffer"""
+        for delta in deltas:
+            if delta[0] == 'i':
+                self.text.insert(delta[1], delta[2])
+            else:
+                self.text.delete(delta[1], f"{delta[1]}+{delta[2]}c")
+        self.text.edit_modified(True)
+        self.status.set(f"Recovered {len(deltas)} unsaved edits")
 
     # Auto-save functionality
     def setup_auto_save(self):
@@ -546,9 +4805,11 @@ class TextEditor:
         if self.auto_save:
             self.auto_save_job()
 
+    @timed
     def auto_save_job(self):
         """Auto-save the current file"""
-        if self.auto_save and self.text.edit_modified():
+        # Untitled buffers are covered by the journal instead of a Save As dialog
+        if self.auto_save and self.current_file and self.text.edit_modified():
             self.save_file()
             self.status.set(f"Auto-saved at {datetime.now().strftime('%H:%M')}")
         
@@ -556,23 +4817,109 @@ class TextEditor:
             self.root.after(self.auto_save_interval, self.auto_save_job)
 
     # Status bar
+    def schedule_status(self, event=None):
+        """Refresh the metrics once the pending events have been handled"""
+        if not self.status_job:
+            self.status_job = self.root.after_idle(self.update_status)
+
+    @timed
     def update_status(self, event=None):
-        """Update status bar information"""
+        """Update the cursor position, document and selection metrics"""
+        self.status_job = None
         line, col = self.text.index(tk.INSERT).split('.')
-        lines = len(self.text.get('1.0', tk.END).splitlines())
-        modified = "*" if self.text.edit_modified() else ""
-        self.status.set(f"Line: {line}, Col: {col} | Lines: {lines} {modified}")
+        modified = " *" if self.text.edit_modified() else ""
+        if self.large_file:
+            line = self.global_line(self.text.index(tk.INSERT))
+            self.metrics_status.set(f"Line: {line}, Col: {col} | Lines: {self.large_file.line_count()}{modified}")
+            return
+        
+        metrics = self.metrics
+        text = (f"Line: {line}, Col: {col} | Lines: {metrics.lines()} | "
+                f"Words: {metrics.words} | Chars: {metrics.chars()} | "
+                f"Undo: {self.history.memory_usage() // 1024} KB")
+        if self.long_lines:
+            text += " | Long lines"
+        selection = self.text.tag_ranges(tk.SEL)
+        if selection:
+            first, last = (tuple(map(int, str(index).split('.'))) for index in selection[:2])
+            start, end = self.document.index_offset(*first), self.document.index_offset(*last)
+            text += f" | Selected: {end - start} chars, {last[0] - first[0] + 1} lines"
+            if end - start == len(self.document):
+                text += f", {metrics.words} words"
+            elif end - start <= self.SELECTION_WORD_LIMIT:
+                text += f", {len(self.document.get(start, end).split())} words"
+        self.metrics_status.set(text + modified)
 
     def exit_editor(self):
         """Clean up and exit the editor"""
-        if self.text.edit_modified():
-            if not messagebox.askyesno("Unsaved Changes", "Exit without saving?"):
+        unsaved = [buffer.name() for buffer in self.buffers if self.buffer_modified(buffer)]
+        if unsaved:
+            if not messagebox.askyesno("Unsaved Changes",
+                                       f"Exit without saving {', '.join(unsaved)}?"):
                 return
         
+        self.stop_load()
+        self.stop_follow()
+        self.finish_save()
         self.save_session()
+        for buffer in self.buffers:
+            if buffer.large_file:
+                buffer.large_file.close()
+            # A clean exit leaves nothing to recover
+            buffer.journal.close(remove=True)
         self.root.destroy()
 
-if __name__ == "__main__":
+def profile_startup(root, editor):
+    """Print time to first paint and time to interactive on stderr"""
+    times = {}
+
+    def painted(event):
+        if 'paint' not in times:
+            times['paint'] = time.perf_counter() - STARTED
+
+    def check():
+        busy = (not editor.session_restored or editor.file_loader or editor.highlight_busy
+                or editor.highlight_job or editor.pending_spans)
+        if busy:
+            root.after(5, check)
+            return
+        ready = time.perf_counter() - STARTED
+        print(f"startup: first paint {times.get('paint', ready) * 1000:.0f} ms, "
+              f"interactive {ready * 1000:.0f} ms", file=sys.stderr)
+
+    editor.text.bind("<Expose>", painted, add='+')
+    root.after_idle(check)
+
+
+def main(argv=None):
+    """Start the editor, or run a batch replace when --replace is given"""
+    parser = argparse.ArgumentParser(description="PyEdit text editor")
+    parser.add_argument('paths', nargs='*', help="file to open, or files and directories to --replace in")
+    parser.add_argument('--replace', nargs=2, metavar=('PATTERN', 'REPL'),
+                        help="replace PATTERN with REPL in PATHS without opening a window")
+    parser.add_argument('--regex', action='store_true', help="treat PATTERN as a regular expression")
+    parser.add_argument('--case-sensitive', action='store_true', help="match case exactly")
+    parser.add_argument('--whole-word', action='store_true', help="only match whole words")
+    parser.add_argument('--dry-run', action='store_true', help="show the changes without writing them")
+    parser.add_argument('--jobs', type=int, default=None, help="worker processes (default: one per core)")
+    parser.add_argument('--startup-profile', action='store_true',
+                        help="report time to first paint and time to interactive")
+    args = parser.parse_args(argv)
+
+    if args.replace:
+        if not args.paths:
+            parser.error("--replace needs at least one path")
+        return run_batch_replace(args)
+
     root = tk.Tk()
     editor = TextEditor(root)
-    root.mainloop()
\ No newline at end of file
+    if args.paths:
+        root.after_idle(editor.open_paths, args.paths)
+    if args.startup_profile:
+        profile_startup(root, editor)
+    root.mainloop()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
\ No newline at end of file